@@ -0,0 +1,94 @@
+"""Headless AR dashboard pipeline: ingestion, column mapping, normalization, aging, aggregation and export.
+
+Everything here works without Streamlit, so the same code drives ``ar_dashboard.py`` and the
+batch CLI (``python -m ar_core.batch``).
+"""
+from ar_core.aging import DEFAULT_LIMITS, NOT_YET_DUE, age_days, bucket_labels, clean_limits, days_overdue
+from ar_core.columns import (
+    COLUMN_KEYWORDS,
+    ColumnMappingError,
+    apply_mapping,
+    detect_mapping,
+    find_header_row,
+    map_columns,
+    match_col,
+)
+from ar_core.consolidate import consolidate
+from ar_core.customers import CustomerClusters
+from ar_core.cube import ENTITY, GRAND_TOTAL, AgingCube
+from ar_core.export import XLSX_MIME, export_csv, export_excel, export_parquet, export_report
+from ar_core.incremental import StageGraph
+from ar_core.ingest import (
+    WorkbookCache,
+    read_source,
+    read_workbook,
+    read_workbook_streaming,
+    source_key,
+)
+from ar_core.normalize import normalize_frame
+from ar_core.pipeline import (
+    OVERDUE_SHARE,
+    AgingReport,
+    age_dataset,
+    build_report,
+    filter_dataset,
+    filter_rows,
+    pivot_display,
+    pivot_index,
+    prepare_dataset,
+    run_report,
+)
+from ar_core.profiles import Layout, ProfileStore, load_layout
+from ar_core.profiling import StageProfiler
+from ar_core.search import InvoiceSearch
+from ar_core.sweep import BucketIndex, compare_configurations
+
+__all__ = [
+    "COLUMN_KEYWORDS",
+    "DEFAULT_LIMITS",
+    "ENTITY",
+    "GRAND_TOTAL",
+    "NOT_YET_DUE",
+    "OVERDUE_SHARE",
+    "XLSX_MIME",
+    "AgingCube",
+    "AgingReport",
+    "BucketIndex",
+    "ColumnMappingError",
+    "CustomerClusters",
+    "InvoiceSearch",
+    "Layout",
+    "ProfileStore",
+    "StageGraph",
+    "StageProfiler",
+    "WorkbookCache",
+    "age_dataset",
+    "age_days",
+    "apply_mapping",
+    "bucket_labels",
+    "build_report",
+    "clean_limits",
+    "compare_configurations",
+    "consolidate",
+    "days_overdue",
+    "detect_mapping",
+    "export_csv",
+    "export_excel",
+    "export_parquet",
+    "export_report",
+    "filter_dataset",
+    "filter_rows",
+    "find_header_row",
+    "load_layout",
+    "map_columns",
+    "match_col",
+    "normalize_frame",
+    "pivot_display",
+    "pivot_index",
+    "prepare_dataset",
+    "read_source",
+    "read_workbook",
+    "read_workbook_streaming",
+    "run_report",
+    "source_key",
+]
@@ -0,0 +1,53 @@
+"""Vectorized aging: days overdue and bucket assignment over whole columns."""
+import numpy as np
+import pandas as pd
+
+NOT_YET_DUE = "Not Yet Due"
+DEFAULT_LIMITS = (30, 60, 90)
+
+
+def clean_limits(limits):
+    """Return bucket upper limits as sorted, de-duplicated, non-negative ints."""
+    cleaned = sorted({max(0, int(float(str(x).replace(",", "").strip()))) for x in limits})
+    if not cleaned:
+        raise ValueError("At least one aging bucket limit is required.")
+    return cleaned
+
+
+def bucket_labels(limits, not_yet_due=True):
+    """Labels in display order, e.g. ['Not Yet Due', '0–30 Days', ..., '>90 Days']."""
+    limits = clean_limits(limits)
+    labels = [NOT_YET_DUE] if not_yet_due else []
+    lower = 0
+    for limit in limits:
+        labels.append(f"{lower}–{limit} Days")
+        lower = limit + 1
+    labels.append(f">{limits[-1]} Days")
+    return labels
+
+
+def days_overdue(due_dates, today=None):
+    """Whole days past ``due_dates`` as int64; negative means not yet due, missing dates count as 0."""
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now().date()).normalize()
+    due = pd.to_datetime(pd.Series(due_dates), errors="coerce")
+    days = (today - due).dt.days
+    return days.fillna(0).astype("int64")
+
+
+def age_days(days, limits, not_yet_due=True):
+    """Assign each value in ``days`` to its bucket and return an ordered Categorical.
+
+    A day count ``d`` falls in the first bucket whose upper limit satisfies ``d <= limit``;
+    anything above the last limit goes to the ``>N Days`` bucket. Negative counts go to
+    ``Not Yet Due`` when enabled, otherwise to the first bucket.
+    """
+    limits = clean_limits(limits)
+    labels = bucket_labels(limits, not_yet_due=not_yet_due)
+    d = np.nan_to_num(np.asarray(days, dtype="float64"), nan=0.0)
+
+    codes = np.searchsorted(np.asarray(limits, dtype="float64"), d, side="left")
+    if not_yet_due:
+        codes += 1
+        codes[d < 0] = 0
+
+    return pd.Categorical.from_codes(codes.astype("int16"), categories=labels, ordered=True)
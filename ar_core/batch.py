@@ -0,0 +1,106 @@
+"""Batch mode: age every AR workbook in a folder and write one export per file.
+
+Usage (from the repository root):
+
+    python -m ar_core.batch "D:/AR Reports" --out "D:/AR Reports/aging" --workers 8 --buckets 30,60,90
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from ar_core.aging import DEFAULT_LIMITS
+from ar_core.pipeline import run_report
+from ar_core.profiles import ProfileStore
+
+WORKBOOK_PATTERNS = ("*.xlsx", "*.xls")
+
+
+def find_workbooks(folder, patterns=WORKBOOK_PATTERNS):
+    """Sorted workbook paths in ``folder``, skipping Excel's ``~$`` lock files."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(folder, pattern)))
+    return sorted(p for p in paths if not os.path.basename(p).startswith("~$"))
+
+
+def process_workbook(path, out_dir, limits=DEFAULT_LIMITS, not_yet_due=True, today=None, profiles=None):
+    """Age one workbook and write ``<name> - Aging.xlsx`` to ``out_dir``; returns a summary row.
+
+    ``profiles`` are the saved column-mapping profiles (``ProfileStore.profiles()``).
+    """
+    start = time.perf_counter()
+    summary = {"File": os.path.basename(path), "Output": "", "Invoices": 0, "Customers": 0,
+               "Invoice Amount": 0.0, "Due Amount": 0.0, "Seconds": 0.0, "Error": ""}
+    try:
+        report = run_report(path, limits, not_yet_due=not_yet_due, today=today, profiles=profiles)
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + " - Aging.xlsx")
+        with open(out_path, "wb") as fh:
+            fh.write(report.to_excel())
+
+        totals = report.cube.totals()
+        summary.update(
+            Output=out_path,
+            Invoices=int(totals["Invoices"]),
+            Customers=len(report.cube.customers()),
+            **{"Invoice Amount": float(totals["Invoice Amount"]), "Due Amount": float(totals["Due Amount"])},
+        )
+    except Exception as exc:  # one bad workbook must not stop the batch
+        summary["Error"] = f"{type(exc).__name__}: {exc}"
+    summary["Seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_batch(folder, out_dir, limits=DEFAULT_LIMITS, not_yet_due=True, workers=None, today=None, profiles=None):
+    """Process every workbook in ``folder`` in parallel; returns a summary DataFrame."""
+    paths = find_workbooks(folder)
+    os.makedirs(out_dir, exist_ok=True)
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now().date())
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_workbook, p, out_dir, limits, not_yet_due, today, profiles) for p in paths]
+        for future in as_completed(futures):
+            rows.append(future.result())
+    return pd.DataFrame(rows).sort_values("File", ignore_index=True) if rows else pd.DataFrame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate aging pivots and exports for a folder of AR workbooks.")
+    parser.add_argument("folder", help="folder containing .xlsx/.xls AR reports")
+    parser.add_argument("--out", help="output folder (default: <folder>/aging_exports)")
+    parser.add_argument("--buckets", default=",".join(map(str, DEFAULT_LIMITS)),
+                        help="comma-separated bucket upper limits in days (default: %(default)s)")
+    parser.add_argument("--no-not-yet-due", action="store_true",
+                        help="put invoices that are not yet due in the first bucket")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--summary", help="also write the run summary to this CSV file")
+    args = parser.parse_args(argv)
+
+    out_dir = args.out or os.path.join(args.folder, "aging_exports")
+    limits = [int(x) for x in args.buckets.split(",") if x.strip()]
+
+    start = time.perf_counter()
+    profiles = ProfileStore().profiles()  # header rows and mappings saved from the dashboard
+    summary = run_batch(args.folder, out_dir, limits, not args.no_not_yet_due, args.workers, profiles=profiles)
+    if summary.empty:
+        print(f"No workbooks found in {args.folder}", file=sys.stderr)
+        return 1
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.drop(columns=["Output"]).to_string(index=False))
+    if args.summary:
+        summary.to_csv(args.summary, index=False)
+
+    failed = int((summary["Error"] != "").sum())
+    print(f"\n{len(summary) - failed}/{len(summary)} workbooks exported to {out_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
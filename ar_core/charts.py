@@ -0,0 +1,140 @@
+"""Aging charts built from pre-aggregated data only: the cube and the bucket index, never invoice rows.
+
+Top-N folding and due-date binning happen here, on the server, so a figure carries at most
+``top + 1`` bars per bucket or ``max_bins`` timeline points, whatever the number of
+invoices. Plotly is imported only when a figure is built.
+"""
+import pandas as pd
+
+from ar_core.aging import NOT_YET_DUE
+from ar_core.cube import GRAND_TOTAL
+
+OTHERS = "Others"
+DEFAULT_TOP = 15
+MAX_BINS = 60
+WEBGL_POINTS = 1000  # beyond this many points a trace is drawn with WebGL
+# Due-date bin sizes, finest first, as pandas period frequencies
+FREQUENCIES = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q", "Year": "Y"}
+
+
+def top_n_buckets(cube, index, top=DEFAULT_TOP, value="Due Amount"):
+    """``index`` × bucket totals of ``value`` for the ``top`` largest rows by total.
+
+    The remaining rows are summed into one "Others (n)" row, so the table never has more
+    than ``top + 1`` rows. Largest first; the last column is ``Total``.
+    """
+    pivot = cube.pivot(index, value).drop(index=GRAND_TOTAL, errors="ignore")
+    pivot = pivot.sort_values("Total", ascending=False, kind="stable")
+    head, rest = pivot.iloc[:top], pivot.iloc[top:]
+    if len(rest):
+        head = pd.concat([head, rest.sum().to_frame(f"{OTHERS} ({len(rest):,})").T])
+    head.index.name = index
+    return head
+
+
+def due_date_bins(first, last, freq=None, max_bins=MAX_BINS):
+    """Due-date periods covering ``first``..``last``: of ``freq``, else the finest with at most ``max_bins``."""
+    if freq is None:
+        for freq in FREQUENCIES.values():
+            if len(pd.period_range(first, last, freq=freq)) <= max_bins:
+                break
+    return pd.period_range(first, last, freq=freq)
+
+
+def due_date_timeline(index, today, groups=None, value="Due Amount", freq=None, max_bins=MAX_BINS):
+    """Totals of ``value`` and invoice counts per due-date period, answered from a ``BucketIndex``.
+
+    A due date ``d`` is ``today - days`` overdue, so each period boundary is one Days
+    Overdue edge and a period's total is a difference of the index's running totals.
+    Missing due dates count as due ``today``, as they do in the aging buckets.
+    """
+    today = pd.Timestamp(today).normalize()
+    if len(index) == 0:
+        return pd.DataFrame(columns=["Due Date", value, "Invoices", "Overdue"])
+    low, high = index.day_range
+    periods = due_date_bins(today - pd.Timedelta(days=high), today - pd.Timedelta(days=low), freq, max_bins)
+    starts = periods.start_time
+    # period k holds starts[k] <= due < starts[k+1], i.e. today - starts[k+1] < days <= today - starts[k]
+    edges = sorted((today - start).days for start in starts[1:])
+    sums = index.segment_sums(edges, groups)
+    return pd.DataFrame(
+        {
+            "Due Date": starts,
+            value: sums[value].sum(axis=0)[::-1],
+            "Invoices": sums["Invoices"].sum(axis=0)[::-1],
+            "Overdue": starts < today,
+        }
+    )
+
+
+def bucket_colors(buckets):
+    """One colour per bucket: neutral for Not Yet Due, then green to red with age."""
+    from plotly.colors import sample_colorscale
+
+    aged = [b for b in buckets if b != NOT_YET_DUE]
+    scale = sample_colorscale("RdYlGn_r", [i / max(len(aged) - 1, 1) for i in range(len(aged))])
+    colors = dict(zip(aged, scale))
+    return [colors.get(b, "#9aa5b1") for b in buckets]
+
+
+def stacked_bucket_figure(table, buckets, value="Due Amount", horizontal=False, title=None):
+    """Bars per row of a ``top_n_buckets`` table, stacked by aging bucket."""
+    import plotly.graph_objects as go
+
+    labels = [str(label) for label in table.index]
+    fig = go.Figure()
+    for bucket, color in zip(buckets, bucket_colors(buckets)):
+        amounts = table[bucket].to_numpy()
+        fig.add_trace(
+            go.Bar(
+                name=bucket,
+                x=amounts if horizontal else labels,
+                y=labels if horizontal else amounts,
+                orientation="h" if horizontal else "v",
+                marker_color=color,
+                hovertemplate=f"%{{{'y' if horizontal else 'x'}}}<br>{bucket}: ₹%{{{'x' if horizontal else 'y'}:,.0f}}<extra></extra>",
+            )
+        )
+    fig.update_layout(
+        barmode="stack",
+        title=title,
+        legend_title_text="Aging bucket",
+        height=max(400, 28 * len(labels)) if horizontal else 450,
+        margin=dict(l=10, r=10, t=40 if title else 10, b=10),
+    )
+    if horizontal:
+        fig.update_yaxes(autorange="reversed")  # largest at the top
+        fig.update_xaxes(title_text=f"{value} (₹)")
+    else:
+        fig.update_yaxes(title_text=f"{value} (₹)")
+    return fig
+
+
+def timeline_figure(timeline, today, value="Due Amount", title=None):
+    """``value`` per due-date period, overdue periods in red; WebGL line past ``WEBGL_POINTS`` points."""
+    import plotly.graph_objects as go
+
+    colors = timeline["Overdue"].map({True: "#d62728", False: "#2ca02c"}).tolist()
+    hover = "%{x|%d %b %Y}<br>₹%{y:,.0f} · %{customdata:,} invoices<extra></extra>"
+    if len(timeline) > WEBGL_POINTS:
+        trace = go.Scattergl(
+            x=timeline["Due Date"], y=timeline[value], mode="lines+markers",
+            marker=dict(color=colors, size=4), line=dict(color="#7f7f7f", width=1),
+            customdata=timeline["Invoices"], hovertemplate=hover,
+        )
+    else:
+        trace = go.Bar(
+            x=timeline["Due Date"], y=timeline[value], marker_color=colors,
+            customdata=timeline["Invoices"], hovertemplate=hover,
+        )
+    fig = go.Figure(trace)
+    fig.add_vline(x=pd.Timestamp(today).timestamp() * 1000, line_dash="dash", line_color="#555")
+    fig.update_layout(
+        title=title,
+        showlegend=False,
+        height=400,
+        margin=dict(l=10, r=10, t=40 if title else 10, b=10),
+        xaxis_title="Due date",
+        yaxis_title=f"{value} (₹)",
+    )
+    return fig
@@ -0,0 +1,101 @@
+"""Header detection and mapping of workbook columns onto the canonical AR names."""
+
+# Canonical column -> substrings searched (in order) in the workbook's header names
+COLUMN_KEYWORDS = {
+    "Customer Name": ["customer", "client", "party"],
+    "Account Manager": ["account manager", "owner", "manager"],
+    "Invoice No.": ["invoice no", "invoice number", "invoice #", "inv no", "bill no"],
+    "Invoice Amount": ["invoice amount", "amount", "invoice_amt"],
+    "Invoice Date": ["invoice date", "invoice_date", "invoice dt"],
+    "Due Date": ["due date", "duedate", "due_dt"],
+    "Paid Amount": ["paid amount", "paidamount", "amount paid"],
+    "Due Amount": ["due amount", "dueamount", "amount due"],
+    "Payment Status": ["payment status", "status", "paid/unpaid"],
+}
+
+HEADER_KEYWORDS = ["customer", "invoice", "due", "amount", "payment"]
+
+
+class ColumnMappingError(ValueError):
+    """Raised when a workbook has no usable Customer Name column."""
+
+
+def find_header_row(raw, max_scan=10):
+    """Index of the first row (of ``raw`` read with ``header=None``) that looks like the header."""
+    for i in range(min(max_scan, len(raw))):
+        row = [str(x).lower() for x in raw.iloc[i].fillna("")]
+        hits = sum(any(k in cell for cell in row) for k in HEADER_KEYWORDS)
+        if hits >= 2:
+            return i
+    return 0
+
+
+def match_col(df, keywords):
+    for c in df.columns:
+        if any(k.lower() in c.lower() for k in keywords):
+            return c
+    return None
+
+
+def map_columns(df):
+    """Return ``{workbook column: canonical name}`` for every canonical column that was found."""
+    mapping = {}
+    for canonical, keywords in COLUMN_KEYWORDS.items():
+        col = match_col(df, keywords)
+        if col:
+            mapping[col] = canonical
+    return mapping
+
+
+def guess_customer_column(df):
+    """Best-effort pick of the customer column when the keyword mapping found none."""
+    keys = ["customer name", "customer", "client", "party", "cust name", "party name"]
+    for c in df.columns:
+        low = str(c).strip().lower()
+        if any(k in low for k in keys):
+            return c
+
+    # fallback: first non-numeric non-date column
+    for c in df.columns:
+        low = str(c).strip().lower()
+        if any(k in low for k in ["date", "amount", "invoice", "due", "paid", "status", "terms", "no"]):
+            continue
+        sample = df[c].dropna().astype(str).head(20).tolist()
+        if sample and any(not s.strip().replace(",", "").replace("₹", "").replace(".", "").isdigit() for s in sample):
+            return c
+
+    # last resort: first non-empty column
+    for c in df.columns:
+        if df[c].dropna().astype(str).str.strip().astype(bool).any():
+            return c
+    return None
+
+
+def detect_mapping(sample):
+    """``map_columns`` plus the Customer Name fallback, on a small sample of the data rows."""
+    mapping = map_columns(sample)
+    if "Customer Name" not in mapping.values():
+        candidate = guess_customer_column(sample)
+        if candidate is not None and candidate not in mapping:
+            mapping[candidate] = "Customer Name"
+    return mapping
+
+
+def apply_mapping(df, mapping=None):
+    """Rename mapped columns to their canonical names and make sure Customer Name exists.
+
+    Raises ``ColumnMappingError`` if no column with customer values can be found.
+    """
+    mapping = map_columns(df) if mapping is None else mapping
+    df = df.rename(columns=mapping)
+
+    if "Customer Name" not in df.columns or not df["Customer Name"].notna().any():
+        candidate = guess_customer_column(df)
+        if candidate is not None:
+            df["Customer Name"] = df[candidate]
+
+    if "Customer Name" not in df.columns or df["Customer Name"].dropna().astype(str).str.strip().eq("").all():
+        raise ColumnMappingError(
+            "Could not detect any Customer Name values. Detected columns: " + ", ".join(map(str, df.columns.tolist()))
+        )
+    return df
@@ -0,0 +1,120 @@
+"""Consolidation: several entities' AR workbooks read in parallel into one tagged dataset.
+
+Each workbook is read, column-mapped and normalized on its own (every entity exports its
+own headers), tagged with its ``Entity`` and only then combined, so the cube and pivots
+get an entity dimension. Workbooks are parsed in worker processes, so the wall time is
+close to that of the slowest file rather than the sum of all of them.
+"""
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ar_core.columns import ColumnMappingError
+from ar_core.cube import ENTITY
+from ar_core.ingest import read_source
+from ar_core.pipeline import prepare_dataset
+from ar_core.profiles import resolve_layout, sniff_workbook
+
+SUMMARY_COLUMNS = [ENTITY, "Invoices", "Due Amount", "Seconds", "Error"]
+
+
+def entity_names(names):
+    """Entity label per workbook name: the file name without extension, made unique."""
+    labels, seen = [], {}
+    for name in names:
+        label = os.path.splitext(os.path.basename(str(name)))[0].strip() or "Entity"
+        seen[label] = seen.get(label, 0) + 1
+        labels.append(label if seen[label] == 1 else f"{label} ({seen[label]})")
+    return labels
+
+
+def load_entity(source, entity, profiles=None, low_memory=False):
+    """Read, map and normalize one entity's workbook; rows and cleaning report carry ``Entity``.
+
+    The header row and mapping come from the matching profile in ``profiles`` or are
+    detected on the first rows; ``low_memory`` is passed on to ``prepare_dataset``.
+    Returns ``(df, cleaning_report, layout)``.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    layout = resolve_layout(sniff_workbook(source), profiles)
+    raw = read_source(source, layout.header_row, usecols=layout.usecols)
+    df, report = prepare_dataset(raw, layout.mapping or None, low_memory)
+    df = df.copy(deep=False)
+    df.insert(0, ENTITY, pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=[entity]))
+    report.insert(0, ENTITY, entity)
+    return df, report, layout
+
+
+def _load_timed(entity, source, profiles, low_memory=False):
+    """``load_entity`` for a pool worker: never raises, reports its time and error instead."""
+    start = time.perf_counter()
+    try:
+        df, report, layout = load_entity(source, entity, profiles, low_memory)
+        error = ""
+    except Exception as exc:  # one bad workbook must not stop the others
+        df, report, layout, error = None, None, None, f"{type(exc).__name__}: {exc}"
+    return entity, df, report, layout, time.perf_counter() - start, error
+
+
+def combine_entities(frames):
+    """Concatenate entity frames, keeping categorical columns categorical across all of them."""
+    frames = [f.copy(deep=False) for f in frames]
+    for col in dict.fromkeys(c for f in frames for c in f.columns):
+        present = [f[col] for f in frames if col in f.columns]
+        if not all(isinstance(s.dtype, pd.CategoricalDtype) for s in present):
+            continue
+        categories = pd.Index(list(dict.fromkeys(c for s in present for c in s.cat.categories)))
+        for f in frames:
+            if col in f.columns:
+                f[col] = f[col].cat.set_categories(categories)
+            else:
+                f[col] = pd.Categorical.from_codes(np.full(len(f), -1, dtype="int8"), categories=categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def consolidate(sources, store=None, workers=None, processes=True, low_memory=False):
+    """Read every ``{entity: path or workbook bytes}`` in parallel and combine them.
+
+    Each workbook's layout comes from ``store`` (a ``ProfileStore``) when its header is
+    known; newly detected layouts are saved back to it. With ``low_memory`` every entity is
+    prepared in low-memory mode and ``df.attrs["memory_bytes"]`` holds the summed footprints.
+
+    Returns ``(df, cleaning_report, summary)``; ``summary`` has one row per entity with its
+    invoice count, balance, read time and error (failed workbooks are left out of ``df``).
+    Raises ``ColumnMappingError`` when no workbook could be loaded.
+    """
+    if not sources:
+        raise ValueError("No workbooks to consolidate")
+    workers = min(len(sources), workers or os.cpu_count() or 1)
+    pool_type = ProcessPoolExecutor if processes and workers > 1 else ThreadPoolExecutor
+    profiles = store.profiles() if store is not None else None
+    with pool_type(max_workers=workers) as pool:
+        futures = [pool.submit(_load_timed, entity, src, profiles, low_memory) for entity, src in sources.items()]
+        results = [future.result() for future in futures]
+
+    frames, reports, summary = [], [], []
+    for entity, df, report, layout, seconds, error in results:
+        if store is not None and layout is not None:
+            store.remember(layout)
+        row = {ENTITY: entity, "Invoices": 0, "Due Amount": 0.0, "Seconds": round(seconds, 3), "Error": error}
+        if df is not None:
+            frames.append(df)
+            reports.append(report)
+            row["Invoices"] = len(df)
+            if "Due Amount" in df.columns:
+                row["Due Amount"] = float(df["Due Amount"].sum())
+        summary.append(row)
+    summary = pd.DataFrame(summary, columns=SUMMARY_COLUMNS)
+
+    if not frames:
+        errors = "; ".join(f"{r[ENTITY]}: {r['Error']}" for r in summary.to_dict("records"))
+        raise ColumnMappingError(f"None of the workbooks could be loaded ({errors})")
+    df = combine_entities(frames)
+    if low_memory:
+        df.attrs["memory_bytes"] = tuple(int(sum(f.attrs["memory_bytes"][i] for f in frames)) for i in (0, 1))
+    return df, pd.concat(reports, ignore_index=True), summary
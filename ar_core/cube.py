@@ -0,0 +1,122 @@
+"""Pre-aggregated Account Manager × Customer × Aging Bucket cube."""
+import numpy as np
+import pandas as pd
+
+UNASSIGNED = "(Unassigned)"
+GRAND_TOTAL = "Grand Total"
+ENTITY = "Entity"
+MEASURES = ("Invoice Amount", "Paid Amount", "Due Amount")
+COUNT = "Invoices"
+DIMENSIONS = ("Account Manager", "Customer Name", "Aging Bucket")
+
+
+class AgingCube:
+    """Sums of the money columns and invoice counts per (Account Manager, Customer, Bucket).
+
+    Consolidated datasets (with an ``Entity`` column) get ``Entity`` as a leading dimension.
+    Built once per dataset and bucket configuration; filters, pivots and KPI totals are
+    answered from this table, whose size depends on the number of distinct
+    manager/customer/bucket combinations rather than on the number of invoices.
+    """
+
+    def __init__(self, table, buckets):
+        self.table = table
+        self.buckets = list(buckets)
+
+    @classmethod
+    def build(cls, df, buckets):
+        """Aggregate an aged invoice frame (must have ``Customer Name`` and ``Aging Bucket``)."""
+        frame = measure_frame(df)
+        frame["Aging Bucket"] = df["Aging Bucket"].array
+        dimensions = group_dimensions(df) + ["Aging Bucket"]
+        table = frame.groupby(dimensions, observed=True, sort=True)[list(MEASURES) + [COUNT]].sum()
+        return cls(table, buckets)
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def empty(self):
+        return self.table.empty
+
+    def _level(self, name):
+        return self.table.index.get_level_values(name)
+
+    def entities(self):
+        """Entities of a consolidated cube (empty for a single workbook)."""
+        if ENTITY not in self.table.index.names:
+            return []
+        return sorted(self._level(ENTITY).unique().tolist())
+
+    def managers(self):
+        return sorted(self._level("Account Manager").unique().tolist())
+
+    def customers(self):
+        return sorted(self._level("Customer Name").unique().tolist())
+
+    def slice(self, manager=None, customer=None, entity=None):
+        """Return a cube restricted to one Account Manager, Customer and/or Entity (``None``/"All" = no filter)."""
+        mask = np.ones(len(self.table), dtype=bool)
+        if entity not in (None, "All") and ENTITY in self.table.index.names:
+            mask &= self._level(ENTITY) == entity
+        if manager not in (None, "All"):
+            mask &= self._level("Account Manager") == manager
+        if customer not in (None, "All"):
+            mask &= self._level("Customer Name") == customer
+        return AgingCube(self.table[mask], self.buckets)
+
+    def totals(self):
+        """Money sums and invoice count over the whole (sliced) cube."""
+        return self.table.sum()
+
+    def pivot(self, index, value="Invoice Amount"):
+        """``index`` × bucket table of ``value`` with a Grand Total row and a Total column."""
+        pivot = (
+            self.table[value]
+            .groupby(level=[index, "Aging Bucket"], observed=True)
+            .sum()
+            .unstack("Aging Bucket", fill_value=0)
+        )
+        pivot = pivot.reindex(columns=self.buckets, fill_value=0)
+        pivot.index = pivot.index.astype(object)
+        pivot = pivot.sort_index()
+        pivot.columns = pd.Index(self.buckets, name=None)
+
+        pivot.loc[GRAND_TOTAL] = pivot.sum()
+        pivot["Total"] = pivot[self.buckets].sum(axis=1)
+        pivot.index.name = index
+        return pivot
+
+
+def group_dimensions(df):
+    """Cube dimensions above the bucket: [Entity,] Account Manager, Customer Name."""
+    return ([ENTITY] if ENTITY in df.columns else []) + [d for d in DIMENSIONS if d != "Aging Bucket"]
+
+
+def measure_frame(df):
+    """The group dimensions, money measures and a row count of ``df``, ready to aggregate."""
+    frame = pd.DataFrame(
+        {
+            **({ENTITY: df[ENTITY].array} if ENTITY in df.columns else {}),
+            "Account Manager": _manager_column(df),
+            "Customer Name": df["Customer Name"].array,
+        }
+    )
+    for col in MEASURES:
+        frame[col] = df[col].to_numpy() if col in df.columns else 0.0
+    frame[COUNT] = np.int64(1)
+    return frame
+
+
+def _manager_column(df):
+    """Account Manager with missing values (or a missing column) mapped to ``(Unassigned)``."""
+    if "Account Manager" not in df.columns:
+        return pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=[UNASSIGNED])
+    managers = df["Account Manager"]
+    if isinstance(managers.dtype, pd.CategoricalDtype):
+        if managers.isna().any():
+            if UNASSIGNED not in managers.cat.categories:
+                managers = managers.cat.add_categories([UNASSIGNED])
+            managers = managers.fillna(UNASSIGNED)
+        return managers.array
+    return managers.fillna(UNASSIGNED).array
@@ -0,0 +1,219 @@
+"""Customer-name normalization and near-duplicate clustering over the distinct names.
+
+"ABC Pvt Ltd", "ABC PVT. LTD." and "M/s A.B.C. Private Limited" are one customer, but the
+raw names split its exposure over several pivot rows. Clustering runs in two passes over
+the distinct names (never over invoices):
+
+1. ``name_key`` folds case, accents, punctuation and legal-form spellings; names with the
+   same key are merged outright. This is the default (``threshold=1``).
+2. Opt-in fuzzy matching: keys are compared by character trigrams through a blocking
+   index over each key's rarest trigrams, so a key is only compared with the few keys
+   that could reach the similarity ``threshold`` (Jaccard). Clusters do not chain: every
+   member must match the cluster's canonical key itself, and names with a different
+   number of words or legal form ("... Ltd" / "... LLP") are never merged.
+
+The work grows with the number of distinct names times their length, not with its square.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_THRESHOLD = 1.0  # only identical name keys merge
+FUZZY_THRESHOLD = 0.9  # suggested similarity when fuzzy matching is switched on
+MIN_FUZZY_LENGTH = 6  # shorter keys only merge on exact key matches
+
+# Spellings of the same legal form, folded to one token
+LEGAL_FORMS = {
+    "private": "pvt",
+    "pvt": "pvt",
+    "pvtltd": "pvt ltd",
+    "limited": "ltd",
+    "ltd": "ltd",
+    "llp": "llp",
+    "incorporated": "inc",
+    "inc": "inc",
+    "corporation": "corp",
+    "corp": "corp",
+    "company": "co",
+    "co": "co",
+    "llc": "llc",
+    "plc": "plc",
+}
+
+_HONORIFIC = re.compile(r"^\s*m\s*/\s*s\b\.?\s*")  # "M/s ABC Traders"
+_JOINED = re.compile(r"[.'`’]")  # "A.B.C." -> "abc", "O'Neil" -> "oneil"
+_SEPARATORS = re.compile(r"[^\w]+")
+_NUMBERS = re.compile(r"\d+")
+_RAW_KEY = "#"  # prefix of a name with an empty name_key ("-", "??"); never in a name_key
+
+
+def name_key(name):
+    """Comparison key of a customer name: case, accents, punctuation and legal forms folded."""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _HONORIFIC.sub("", text).replace("&", " and ")
+    text = _SEPARATORS.sub(" ", _JOINED.sub("", text)).replace("_", " ")
+    return " ".join(LEGAL_FORMS.get(token, token) for token in text.split())
+
+
+def cluster_key(name):
+    """``name_key``, or the stripped name itself when nothing is left ("-", "..", "??").
+
+    Placeholder names never share an empty key, so they only merge with identical spellings.
+    """
+    return name_key(name) or _RAW_KEY + str(name).strip()
+
+
+LEGAL_TOKENS = frozenset(" ".join(LEGAL_FORMS.values()).split())
+
+
+def legal_form(key):
+    """The legal-form tokens of a name key, e.g. ``("ltd", "pvt")``; empty when there are none."""
+    return tuple(sorted({token for token in key.split() if token in LEGAL_TOKENS}))
+
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similar_pairs(keys, threshold=DEFAULT_THRESHOLD):
+    """Pairs ``(i, j)`` of ``keys`` whose trigram Jaccard similarity is at least ``threshold``.
+
+    Prefix filtering: with trigrams ordered rarest first, two sets with Jaccard >= t must
+    share one of the first ``|A| - ceil(t * |A|) + 1`` trigrams of each, so only those
+    prefixes are indexed and only keys meeting in a prefix are compared. Keys whose numbers
+    differ, or that start differently ("Ganga Vardhman" / "Vardhman Ganga"), never match.
+    """
+    grams = [_trigrams(k) if len(k) >= MIN_FUZZY_LENGTH and not k.startswith(_RAW_KEY) else set() for k in keys]
+    numbers = [_NUMBERS.findall(k) for k in keys]  # "Unit 12" and "Unit 13" are different customers
+    frequency = Counter(gram for g in grams for gram in g)
+    index = defaultdict(list)
+    pairs = []
+    for i, g in enumerate(grams):
+        if not g:
+            continue
+        ordered = sorted(g, key=lambda gram: (frequency[gram], gram))
+        prefix = ordered[: len(g) - math.ceil(threshold * len(g)) + 1]
+        start = keys[i][:2]  # blocks are per leading characters as well
+        candidates = {j for gram in prefix for j in index[start, gram]}
+        for j in candidates:
+            other = grams[j]
+            if numbers[i] != numbers[j]:
+                continue
+            if threshold * len(g) <= len(other) and threshold * len(other) <= len(g):  # size filter
+                shared = len(g & other)
+                if shared / (len(g) + len(other) - shared) >= threshold:
+                    pairs.append((j, i))
+        for gram in prefix:
+            index[start, gram].append(i)
+    return pairs
+
+
+class CustomerClusters:
+    """Canonical customer name for every raw name of a dataset."""
+
+    def __init__(self, names, canonical, counts):
+        self.names = pd.Index(names)
+        self.canonical = np.asarray(canonical, dtype=object)
+        self.counts = np.asarray(counts)
+        self._codes, self.categories = pd.factorize(self.canonical)
+        self.categories = pd.Index(self.categories)
+
+    @classmethod
+    def build(cls, names, counts=None, threshold=DEFAULT_THRESHOLD):
+        """Cluster distinct ``names``; each cluster is named after its most-invoiced spelling.
+
+        ``threshold=1`` (the default) merges only names with identical keys. Below 1, a key
+        joins the cluster of the most-invoiced key it matches directly, with the same legal
+        form, so A~B and B~C never pull A and C together.
+        """
+        names = pd.Index(names)
+        counts = np.ones(len(names), dtype="int64") if counts is None else np.asarray(counts)
+        keys = [cluster_key(n) for n in names]
+
+        # pass 1: same normalized key
+        key_codes, unique_keys = pd.factorize(pd.Index(keys))
+        key_codes = np.asarray(key_codes)
+        key_counts = np.bincount(key_codes, weights=counts, minlength=len(unique_keys))
+        key_cluster = np.arange(len(unique_keys))
+        if threshold < 1:  # pass 2: near-identical keys, each matched against its cluster's center
+            partners = defaultdict(list)
+            for a, b in similar_pairs(list(unique_keys), threshold):
+                key_a, key_b = unique_keys[a], unique_keys[b]
+                # a misspelling changes letters, not the number of words or the legal form
+                if len(key_a.split()) == len(key_b.split()) and legal_form(key_a) == legal_form(key_b):
+                    partners[a].append(b)
+                    partners[b].append(a)
+            assigned = np.zeros(len(unique_keys), dtype=bool)
+            # heaviest keys become centers first, ties go to the alphabetically first key
+            for center in sorted(range(len(unique_keys)), key=lambda k: (-key_counts[k], unique_keys[k])):
+                if assigned[center]:
+                    continue
+                assigned[center] = True
+                for member in partners[center]:
+                    if not assigned[member]:
+                        assigned[member] = True
+                        key_cluster[member] = center
+
+        roots = key_cluster[key_codes]
+        # most invoices wins, ties go to the alphabetically first spelling
+        order = sorted(range(len(names)), key=lambda i: (-counts[i], str(names[i])))
+        best = {}
+        for i in order:
+            best.setdefault(roots[i], i)
+        canonical = [names[best[r]] for r in roots]
+        return cls(names, canonical, counts)
+
+    @classmethod
+    def from_frame(cls, df, column="Customer Name", threshold=DEFAULT_THRESHOLD):
+        """Cluster the categories of ``df[column]``, weighting spellings by invoice count."""
+        values = df[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+        codes = values.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+        return cls.build(values.cat.categories, counts, threshold)
+
+    @property
+    def nbytes(self):
+        """Memory held by the clusters: names, canonical names and codes."""
+        return (
+            int(self.names.memory_usage(deep=True))
+            + int(self.categories.memory_usage(deep=True))
+            + int(self.canonical.nbytes)  # points at the strings already counted in names
+            + int(self.counts.nbytes)
+            + int(self._codes.nbytes)
+        )
+
+    @property
+    def merged(self):
+        """Number of raw names folded into another one."""
+        return len(self.names) - len(self.categories)
+
+    def apply(self, df, column="Customer Name"):
+        """``df`` with ``column`` recoded to the canonical names (a code lookup, no string work)."""
+        values = df[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype) or not values.cat.categories.equals(self.names):
+            values = pd.Categorical(values, categories=self.names)
+        else:
+            values = values.array
+        codes = np.asarray(values.codes)
+        new_codes = np.where(codes >= 0, self._codes[np.maximum(codes, 0)], -1)
+        df = df.copy(deep=False)
+        df[column] = pd.Categorical.from_codes(new_codes, categories=self.categories)
+        return df
+
+    def merges(self):
+        """One row per cluster with more than one spelling, largest first."""
+        frame = pd.DataFrame({"Customer": self.canonical, "Variant": self.names, "Invoices": self.counts})
+        grouped = frame.groupby("Customer", sort=False).agg(
+            Variants=("Variant", "size"), Invoices=("Invoices", "sum"),
+            Spellings=("Variant", lambda v: " · ".join(map(str, v))),
+        )
+        grouped = grouped[grouped["Variants"] > 1].sort_values("Invoices", ascending=False)
+        return grouped.reset_index()
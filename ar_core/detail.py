@@ -0,0 +1,69 @@
+"""Server-side invoice detail view: per-customer row index, filtering, sorting and paging.
+
+Only the rows of the visible page ever leave pandas, so a customer with tens of thousands
+of invoices costs the browser one page, not the whole frame.
+"""
+import numpy as np
+
+from ar_core.cube import ENTITY
+
+DETAIL_COLUMNS = [
+    ENTITY,
+    "Invoice No.",
+    "Invoice Date",
+    "Due Date",
+    "Invoice Amount",
+    "Paid Amount",
+    "Due Amount",
+    "Days Overdue",
+    "Aging Bucket",
+]
+PAGE_SIZES = (25, 50, 100, 250)
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+def customer_rows(df, column="Customer Name"):
+    """``{customer: positional row indices}`` for every customer, from one groupby pass."""
+    if df.empty:
+        return {}
+    return df.groupby(column, observed=True, sort=False).indices
+
+
+def select_rows(df, rows, sort_by=None, ascending=True, buckets=None, search=None, search_column="Invoice No."):
+    """Positions out of ``rows`` that pass the filters, in display order.
+
+    ``buckets`` keeps only those Aging Buckets, ``search`` keeps rows whose
+    ``search_column`` contains it (case-insensitive). Sorting is stable and puts blanks last.
+    """
+    rows = _NO_ROWS if rows is None else np.asarray(rows, dtype=np.intp)
+    if not len(rows):
+        return rows
+
+    keep = np.ones(len(rows), dtype=bool)
+    if buckets and "Aging Bucket" in df.columns:
+        keep &= df["Aging Bucket"].iloc[rows].isin(list(buckets)).to_numpy()
+    if search and search_column in df.columns:
+        text = df[search_column].iloc[rows].astype(str)
+        keep &= text.str.contains(str(search).strip(), case=False, regex=False).to_numpy()
+    rows = rows[keep]
+
+    if sort_by in df.columns and len(rows):
+        values = df[sort_by].iloc[rows].reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        rows = rows[order]
+    return rows
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+def page_frame(df, rows, page, page_size, columns=None):
+    """The rows of one (1-based, clamped) page; ``columns`` limits what is returned."""
+    page = min(max(1, int(page)), page_count(len(rows), page_size))
+    start = (page - 1) * page_size
+    frame = df.iloc[rows[start:start + page_size]]
+    if columns is not None:
+        frame = frame[[c for c in columns if c in frame.columns]]
+    return frame
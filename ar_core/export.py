@@ -0,0 +1,126 @@
+"""Exports of aging pivots and invoice data: streamed Excel, CSV and Parquet."""
+import io
+
+import numpy as np
+import pandas as pd
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+EXPORT_ROW_CHUNK = 10_000
+# Identifiers: stored as text even when every value in one report happens to be a number
+TEXT_COLUMNS = ("Invoice No.",)
+
+
+def _sheet_rows(frame):
+    """Yield worksheet rows (header first) in chunks, with NaN/NaT written as empty cells."""
+    with_index = frame.index.name is not None
+    if with_index:
+        frame = frame.reset_index()
+    yield [str(c) for c in frame.columns]
+
+    for start in range(0, len(frame), EXPORT_ROW_CHUNK):
+        chunk = frame.iloc[start:start + EXPORT_ROW_CHUNK]
+        columns = []
+        for col in chunk.columns:
+            values = chunk[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            if pd.api.types.is_datetime64_any_dtype(values):
+                cells = [None if pd.isna(v) else v.to_pydatetime() for v in values]
+            else:
+                arr = values.to_numpy(dtype=object)
+                cells = np.where(pd.isna(arr), None, arr).tolist()
+            columns.append(cells)
+        yield from zip(*columns)
+
+
+def export_excel(sheets):
+    """Write ``{sheet name: DataFrame}`` to an .xlsx workbook and return its bytes.
+
+    Uses openpyxl's write-only mode, streaming rows out in chunks instead of building
+    every cell object up front. Frames with a named index (pivots) keep it as the
+    first column; plain row indexes are dropped.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, frame in sheets.items():
+        ws = wb.create_sheet(title=str(name)[:31])
+        for row in _sheet_rows(frame):
+            ws.append(row)
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def export_csv(frame):
+    """CSV bytes (UTF-8 with BOM so Excel shows ₹ and Indian names correctly)."""
+    return frame.to_csv(index=frame.index.name is not None).encode("utf-8-sig")
+
+
+def _as_text(values):
+    """``values`` as strings, blanks kept; whole floats lose their ``.0`` (148.0 -> "148")."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.rename_categories(_as_text(values.cat.categories.to_series()).to_numpy())
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype("Int64")
+    return values.astype(object).where(values.isna(), values.astype(str))
+
+
+def arrow_table(df, text_columns=TEXT_COLUMNS):
+    """Convert a frame to Arrow with a schema that stays stable across reports.
+
+    ``text_columns`` and unmapped columns with mixed cell types are stored as text, and
+    categoricals as ``dictionary<int32, string>``.
+    """
+    import pyarrow as pa
+
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if col in text_columns:
+            df[col] = _as_text(df[col])
+        elif df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    df.columns = [str(c) for c in df.columns]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        fields.append(field)
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def export_parquet(frame):
+    """Parquet bytes (zstd); a named index such as a pivot's is kept as a column."""
+    import pyarrow.parquet as pq
+
+    if frame.index.name is not None:
+        frame = frame.reset_index()
+    buf = io.BytesIO()
+    pq.write_table(arrow_table(frame), buf, compression="zstd")
+    return buf.getvalue()
+
+
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": (".xlsx", XLSX_MIME),
+    "CSV": (".csv", CSV_MIME),
+    "Parquet": (".parquet", PARQUET_MIME),
+}
+EXPORT_TABLES = ("Filtered invoices", "Aging pivot")
+
+
+def export_report(fmt, pivot, data, table="Filtered invoices"):
+    """Bytes for one export: Excel gets both sheets, CSV/Parquet the chosen ``table``."""
+    if fmt == "Excel (.xlsx)":
+        return export_excel({"Aging_Pivot": pivot, "Raw_Filtered_Data": data})
+    frame = pivot if table == "Aging pivot" else data
+    if fmt == "CSV":
+        return export_csv(frame)
+    if fmt == "Parquet":
+        return export_parquet(frame)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,85 @@
+"""Incremental recompute: the pipeline as a small DAG of memoized stages.
+
+A Streamlit rerun executes every stage call again, but each stage only recomputes when its
+own inputs or one of its upstream stages changed since the previous run::
+
+    graph.begin_run(profiler)
+    raw = graph.run("ingest", lambda: read(...), inputs=dataset_key)
+    df, report = graph.run("normalize", prepare_dataset, after=("ingest",))
+    aged = graph.run("age", lambda df_report: age_dataset(df_report[0], ...),
+                     inputs=(limits, today), after=("normalize",))
+
+Every stage keeps just its latest value. Values are shared between runs, so downstream
+code must treat them as read-only.
+"""
+from ar_core.profiling import StageProfiler
+
+
+def _rows(value):
+    """Row count of a stage value (first element for tuples), for diagnostics."""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class StageGraph:
+    """Memoized stages keyed on their own inputs plus the versions of their upstream stages."""
+
+    def __init__(self):
+        self._memo = {}  # stage name -> (key, version, value)
+        self._run_versions = {}
+        self.profiler = StageProfiler()
+        self.recomputed = []
+        self.hits = 0
+        self.misses = 0
+        self._next_version = 0
+
+    def begin_run(self, profiler=None):
+        """Start a rerun: forget which stages ran, optionally report stages to ``profiler``."""
+        self._run_versions = {}
+        self.recomputed = []
+        self.profiler = profiler or StageProfiler()
+
+    def run(self, name, compute, inputs=(), after=()):
+        """Return stage ``name``'s value, calling ``compute(*upstream values)`` only if needed.
+
+        ``inputs`` must be hashable/comparable (widget values, keys); ``after`` names the
+        upstream stages, which must already have run in this rerun.
+        """
+        upstream = [self._memo[u] for u in after]
+        key = (tuple(self._run_versions[u] for u in after), inputs)
+        cached = self._memo.get(name)
+        rows_in = _rows(upstream[0][2]) if upstream else None
+
+        with self.profiler.stage(name, rows_in=rows_in) as rec:
+            if cached is not None and cached[0] == key:
+                self.hits += 1
+                version, value = cached[1], cached[2]
+                rec["cached"] = True
+            else:
+                self.misses += 1
+                self._memo.pop(name, None)  # let the old value go before building the new one
+                value = compute(*(u[2] for u in upstream))
+                version = self._next_version  # never reused, even after invalidate()
+                self._next_version += 1
+                self._memo[name] = (key, version, value)
+                self.recomputed.append(name)
+                rec["cached"] = False
+            rec["rows_out"] = _rows(value)
+
+        self._run_versions[name] = version
+        return value
+
+    def invalidate(self, name=None):
+        """Drop one stage's memo (or all of them); downstream stages follow on the next run."""
+        if name is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(name, None)
+
+    def stats(self):
+        return {"stages": len(self._memo), "hits": self.hits, "misses": self.misses,
+                "recomputed": list(self.recomputed)}
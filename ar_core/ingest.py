@@ -0,0 +1,280 @@
+"""Workbook ingestion: parse each AR workbook once and reuse it across reruns."""
+import hashlib
+import os
+import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from itertools import chain, islice
+
+import pandas as pd
+
+from ar_core.columns import find_header_row, map_columns
+
+STREAM_CHUNK_ROWS = 50_000
+
+
+def source_key(source):
+    """Return a cache key for an upload (content hash) or a linked path (path + mtime + size)."""
+    if isinstance(source, (str, os.PathLike)):
+        path = os.path.abspath(os.fspath(source))
+        info = os.stat(path)
+        return ("path", path, info.st_mtime_ns, info.st_size)
+    data = source.getvalue() if hasattr(source, "getvalue") else bytes(source)
+    return ("sha256", hashlib.sha256(data).hexdigest())
+
+
+def read_workbook(source, header_row=0, usecols=None):
+    """Parse a workbook into a DataFrame with stripped column names.
+
+    ``usecols`` (stripped header names) limits parsing to those columns.
+    """
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if usecols:
+        wanted = set(usecols)
+        df = pd.read_excel(source, header=header_row, usecols=lambda c: str(c).strip() in wanted)
+    else:
+        df = pd.read_excel(source, header=header_row)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def is_xlsx(source):
+    """True for .xlsx/.xlsm content (a zip container); legacy .xls needs the regular reader."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        return zipfile.is_zipfile(source)
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def dedupe_names(names):
+    """``names`` with repeats renamed the way ``pd.read_excel`` does: ``Amount``, ``Amount.1``, ..."""
+    counts = {}
+    unique = []
+    for name in names:
+        count = counts.get(name, 0)
+        while count > 0:  # "Amount.1" may itself be taken already
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        unique.append(name)
+    return unique
+
+
+def _column_array(values):
+    """Build an Arrow array for one column chunk; mixed-type cells fall back to text."""
+    import pyarrow as pa
+
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _concat_column(chunks):
+    """Concatenate one column's chunks, casting to text if chunks inferred different types."""
+    import pyarrow as pa
+
+    types = {c.type for c in chunks if c.type != pa.null()}
+    if len(types) > 1:
+        chunks = [c.cast(pa.string()) for c in chunks]
+    elif len(types) == 1:
+        target = types.pop()
+        chunks = [c.cast(target) if c.type == pa.null() else c for c in chunks]
+    return pa.chunked_array(chunks)
+
+
+def read_workbook_streaming(source, max_scan=10, chunk_rows=STREAM_CHUNK_ROWS, stats=None, header_row=None,
+                            usecols=None):
+    """Stream the first sheet of an .xlsx with openpyxl's read-only, values-only iterator.
+
+    The header row is found with ``find_header_row`` on the first ``max_scan`` rows (unless
+    ``header_row`` is given) and only the columns that map onto canonical AR names (or those
+    in ``usecols``) are materialised, ``chunk_rows`` rows at a time, into Arrow arrays. If no
+    customer column can be mapped from the header alone, every column is kept so the
+    Customer Name fallback can still inspect the data.
+
+    ``stats`` (a dict) receives ``rows``, ``columns_kept``, ``columns_total``,
+    ``header_row``, ``first_chunk_seconds`` and ``seconds``.
+    """
+    import pyarrow as pa
+    from openpyxl import load_workbook
+
+    start = time.perf_counter()
+    stats = {} if stats is None else stats
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        head = list(islice(rows, max_scan if header_row is None else max(max_scan, header_row + 1)))
+        if not head or (header_row is not None and header_row >= len(head)):
+            return pd.DataFrame()
+
+        if header_row is None:
+            header_row = find_header_row(pd.DataFrame(head), max_scan=max_scan)
+        header = dedupe_names(
+            str(c).strip() if c is not None else f"Unnamed: {i}" for i, c in enumerate(head[header_row])
+        )
+        mapping = map_columns(pd.DataFrame(columns=header))
+        if usecols:
+            keep = [i for i, name in enumerate(header) if name in set(usecols)]
+        elif "Customer Name" in mapping.values():
+            keep = [i for i, name in enumerate(header) if name in mapping]
+        else:
+            keep = list(range(len(header)))
+
+        columns = {i: [] for i in keep}
+        buffer = []
+        n_rows = 0
+
+        def flush():
+            nonlocal n_rows
+            for i in keep:
+                columns[i].append(_column_array([r[i] if i < len(r) else None for r in buffer]))
+            n_rows += len(buffer)
+            if "first_chunk_seconds" not in stats:
+                stats["first_chunk_seconds"] = time.perf_counter() - start
+            buffer.clear()
+
+        for row in chain(head[header_row + 1:], rows):
+            # skip fully blank rows, as pd.read_excel does
+            if any(row[i] is not None for i in keep if i < len(row)):
+                buffer.append(row)
+                if len(buffer) >= chunk_rows:
+                    flush()
+        if buffer or n_rows == 0:
+            flush()
+    finally:
+        wb.close()
+
+    table = pa.table({header[i]: _concat_column(columns[i]) for i in keep})
+    df = table.to_pandas(coerce_temporal_nanoseconds=True)
+    stats.update(
+        rows=n_rows,
+        columns_kept=len(keep),
+        columns_total=len(header),
+        header_row=header_row,
+        seconds=time.perf_counter() - start,
+    )
+    return df
+
+
+def estimate_bytes(value):
+    """Approximate in-memory size of a cached value (frames, cubes, indexes, bytes and tuples of them)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_bytes(v) for v in value)
+    nbytes = getattr(value, "nbytes", None)  # indexes that know their own size (BucketIndex, ...)
+    if isinstance(nbytes, int):
+        return nbytes
+    table = getattr(value, "table", None)  # AgingCube
+    if isinstance(table, pd.DataFrame):
+        return estimate_bytes(table)
+    return sys.getsizeof(value)
+
+
+class WorkbookCache:
+    """Small LRU cache of parsed workbooks with hit/miss counters.
+
+    With ``max_bytes`` the estimated size of the entries is also kept under that budget,
+    least recently used first. The cache is thread-safe, so one instance can be shared by
+    every session of a Streamlit server; concurrent misses on the same key load it once.
+    Shared values must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=4, max_bytes=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> lock held while that key is being loaded
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _hit(self, key):
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` only on a miss."""
+        with self._lock:
+            if key in self._entries:
+                return self._hit(key)
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                with self._lock:
+                    if key in self._entries:  # another thread loaded it while we waited
+                        return self._hit(key)
+                    self.misses += 1
+                value = loader()
+                size = estimate_bytes(value) if self.max_bytes else 0
+                with self._lock:
+                    self._entries[key] = value
+                    self._sizes[key] = size
+                    self.bytes += size
+                    self._evict()
+                return value
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def _evict(self):
+        # the newest entry always stays, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self.bytes -= self._sizes.pop(key, 0)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def read_source(source, header_row=0, streaming=False, stats=None, usecols=None):
+    """Parse ``source`` with the streaming reader (.xlsx only) or ``read_workbook``.
+
+    Both readers use ``header_row`` (e.g. a confirmed layout's), so they agree on the header.
+    """
+    if streaming and is_xlsx(source):
+        return read_workbook_streaming(source, stats=stats, header_row=header_row, usecols=usecols)
+    return read_workbook(source, header_row, usecols=usecols)
@@ -0,0 +1,158 @@
+"""Single-pass typed normalization of the canonical AR columns."""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+MONEY_COLUMNS = ("Invoice Amount", "Paid Amount", "Due Amount")
+DATE_COLUMNS = ("Invoice Date", "Due Date")
+CATEGORY_COLUMNS = ("Customer Name", "Account Manager", "Payment Status")
+
+# Cell values that mean "nothing here" in the AR exports we receive
+_BLANK_TOKENS = ("", "-", "nan", "none", "null", "n/a")
+_CURRENCY_NOISE = r"[₹,\s]|Rs\.?|INR"
+
+REPORT_COLUMNS = ["Column", "Type", "Parsed", "Coerced", "Blank", "Failed", "Examples"]
+MAX_CATEGORY_SHARE = 0.5  # text columns with fewer distinct values than this share of rows become categoricals
+
+
+def _report_row(column, kind, total, coerced=0, blank=0, failed=0, examples=()):
+    return {
+        "Column": column,
+        "Type": kind,
+        "Parsed": int(total - blank - failed),
+        "Coerced": int(coerced),
+        "Blank": int(blank),
+        "Failed": int(failed),
+        "Examples": ", ".join(map(str, examples)),
+    }
+
+
+def parse_money(values, as_paise=False):
+    """Parse a money column once; returns (numbers, coerced, blank, failed, failed_examples).
+
+    Plain numbers and numeric strings go straight through ``to_numeric``; only the
+    leftover cells (₹ signs, thousands separators, ``(1,234)`` negatives) get string cleanup.
+    Blank and unparseable cells become 0.
+    """
+    if is_numeric_dtype(values) and not is_bool_dtype(values):
+        num = values.astype("float64")
+        coerced, failed, examples = 0, 0, []
+        blank = int(num.isna().sum())
+    else:
+        num = pd.to_numeric(values, errors="coerce").astype("float64")
+        pending = num.isna() & values.notna()
+        blank = int(values.isna().sum())
+        coerced, failed, examples = 0, 0, []
+        if pending.any():
+            text = values[pending].astype(str).str.strip()
+            cleaned = (
+                text.str.replace(_CURRENCY_NOISE, "", regex=True)
+                .str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+            )
+            parsed = pd.to_numeric(cleaned, errors="coerce")
+            is_blank = cleaned.str.lower().isin(_BLANK_TOKENS)
+            bad = parsed.isna() & ~is_blank
+            num[pending] = parsed
+            coerced = int(parsed.notna().sum())
+            blank += int(is_blank.sum())
+            failed = int(bad.sum())
+            examples = text[bad].unique()[:3].tolist()
+
+    num = num.fillna(0.0)
+    if as_paise:
+        num = pd.Series(np.rint(num.to_numpy() * 100).astype("int64"), index=num.index)
+    return num, coerced, blank, failed, examples
+
+
+def parse_dates(values):
+    """Parse a date column once; returns (datetime64 values, blank, failed, failed_examples)."""
+    if is_datetime64_any_dtype(values):
+        return values, int(values.isna().sum()), 0, []
+    dates = pd.to_datetime(values, errors="coerce")
+    missing = values[dates.isna()]
+    is_blank = missing.isna() | missing.astype(str).str.strip().str.lower().isin(_BLANK_TOKENS)
+    bad = missing[~is_blank]
+    return dates, int(is_blank.sum()), len(bad), bad.astype(str).unique()[:3].tolist()
+
+
+def to_category(values):
+    """Strip text labels and store them as a categorical; blanks become missing.
+
+    Stripping is done on the distinct labels only, not once per row.
+    """
+    codes, uniques = pd.factorize(values)
+    labels = pd.Index(uniques).astype(str).str.strip()
+    labels = labels.where(labels != "")
+    label_codes, categories = pd.factorize(labels)
+    mapped = np.where(codes >= 0, label_codes[np.maximum(codes, 0)], -1)
+    return pd.Series(pd.Categorical.from_codes(mapped, categories=categories), index=values.index)
+
+
+def normalize_frame(df, money_as_paise=False):
+    """Convert the canonical columns of a mapped frame into compact dtypes.
+
+    Money columns become float64 rupees (or int64 paise), dates datetime64 and the
+    Customer / Account Manager / Payment Status columns categoricals. Each column is
+    parsed exactly once. Missing money columns are added as zeros and missing date
+    columns as NaT so downstream code can rely on them.
+
+    Returns ``(frame, report)`` where ``report`` lists, per column, how many values
+    parsed cleanly, needed coercion, were blank or failed (failures are set to 0 / NaT).
+    """
+    out = df.copy(deep=False)
+    rows = []
+    total = len(out)
+
+    for col in MONEY_COLUMNS:
+        if col not in out.columns:
+            out[col] = 0 if money_as_paise else 0.0
+            rows.append(_report_row(col, "missing", total, blank=total))
+            continue
+        num, coerced, blank, failed, examples = parse_money(out[col], as_paise=money_as_paise)
+        out[col] = num
+        rows.append(_report_row(col, str(num.dtype), total, coerced, blank, failed, examples))
+
+    for col in DATE_COLUMNS:
+        if col not in out.columns:
+            out[col] = pd.Series(pd.NaT, index=out.index, dtype="datetime64[ns]")
+            rows.append(_report_row(col, "missing", total, blank=total))
+            continue
+        dates, blank, failed, examples = parse_dates(out[col])
+        out[col] = dates
+        rows.append(_report_row(col, str(dates.dtype), total, blank=blank, failed=failed, examples=examples))
+
+    for col in CATEGORY_COLUMNS:
+        if col not in out.columns:
+            continue
+        cat = to_category(out[col])
+        out[col] = cat
+        rows.append(_report_row(col, "category", total, blank=int(cat.isna().sum())))
+
+    return out, pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def frame_bytes(df):
+    """Memory footprint of ``df`` in bytes, Python string objects included."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_frame(df, keep=None):
+    """Low-memory form of a normalized frame; columns are converted, never copied needlessly.
+
+    Only the ``keep`` columns (default: all) are kept, remaining text columns become
+    categoricals (few distinct values) or Arrow-backed ``string[pyarrow]``, and the row
+    labels a filtered frame carries are replaced by a ``RangeIndex``.
+    """
+    if keep is not None:
+        df = df[[c for c in df.columns if c in keep]]
+    out = df.copy(deep=False)
+    for col in out.columns:
+        values = out[col]
+        if values.dtype != object and values.dtype != pd.StringDtype("python"):
+            continue
+        if values.nunique(dropna=True) <= MAX_CATEGORY_SHARE * len(values):
+            out[col] = to_category(values)
+        else:
+            out[col] = values.astype("string[pyarrow]")
+    out.index = pd.RangeIndex(len(out))
+    return out
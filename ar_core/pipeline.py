@@ -0,0 +1,153 @@
+"""The AR aging pipeline as plain functions: read → map → normalize → age → aggregate."""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ar_core.aging import DEFAULT_LIMITS, age_days, bucket_labels, clean_limits, days_overdue
+from ar_core.columns import COLUMN_KEYWORDS, apply_mapping
+from ar_core.cube import ENTITY, UNASSIGNED, AgingCube
+from ar_core.customers import DEFAULT_THRESHOLD, CustomerClusters
+from ar_core.export import export_excel
+from ar_core.ingest import read_source
+from ar_core.normalize import compact_frame, frame_bytes, normalize_frame
+from ar_core.profiles import resolve_layout, sniff_workbook
+
+VIEWS = {"Customer-wise": "Customer Name", "Account Manager Summary": "Account Manager", "Entity Summary": ENTITY}
+OVERDUE_SHARE = "Overdue %"
+
+
+def prepare_dataset(raw, mapping=None, low_memory=False):
+    """Map and normalize a freshly read workbook; keep only customers with a balance due.
+
+    ``low_memory`` drops the unmapped columns and stores text as categoricals or
+    ``string[pyarrow]`` (see ``compact_frame``); the footprint before and after, in bytes,
+    is left in ``df.attrs["memory_bytes"]``.
+
+    Returns ``(df, cleaning_report)``. Raises ``ColumnMappingError`` when no customer
+    column can be found.
+    """
+    df = apply_mapping(raw, mapping)
+    has_due_amount = "Due Amount" in df.columns
+    df, report = normalize_frame(df)
+    keep = df["Customer Name"].notna().to_numpy()
+    if has_due_amount:
+        keep &= (df["Due Amount"] > 0).to_numpy()  # keep only invoices with balance due
+    df = df[keep]  # one row selection, not one per condition
+    if low_memory:
+        before = frame_bytes(df)
+        df = compact_frame(df, keep=COLUMN_KEYWORDS)
+        df.attrs["memory_bytes"] = (before, frame_bytes(df))
+    return df, report
+
+
+def age_dataset(df, limits=DEFAULT_LIMITS, not_yet_due=True, today=None, days=None):
+    """Return ``df`` with ``Days Overdue`` and an ordered categorical ``Aging Bucket`` added.
+
+    ``days`` reuses Days Overdue already computed for ``today`` (e.g. ``BucketIndex.days``).
+    """
+    df = df.copy(deep=False)
+    df["Days Overdue"] = days if days is not None else days_overdue(df["Due Date"], today=today).to_numpy()
+    df["Aging Bucket"] = age_days(df["Days Overdue"], limits, not_yet_due=not_yet_due)
+    return df
+
+
+def filter_rows(df, manager=None, customer=None, entity=None):
+    """Sorted positions of the invoices of one Account Manager, Customer and/or Entity.
+
+    ``None``/"All" means no filter on that column; with no filter at all the result is
+    ``None`` (every row), so callers can keep using ``df`` without taking a copy. Like the
+    cube, a blank (or absent) Account Manager matches ``UNASSIGNED``.
+    """
+    keep = None
+    for column, value in ((ENTITY, entity), ("Account Manager", manager), ("Customer Name", customer)):
+        if value in (None, "All") or (column == ENTITY and ENTITY not in df.columns):
+            continue
+        if column == "Account Manager" and value == UNASSIGNED:
+            if column not in df.columns:
+                continue  # the cube files every invoice under UNASSIGNED
+            match = (df[column].isna() | (df[column] == value)).to_numpy()
+        else:
+            match = (df[column] == value).to_numpy()
+        keep = match if keep is None else keep & match
+    return None if keep is None else np.flatnonzero(keep)
+
+
+def filter_dataset(df, manager=None, customer=None, entity=None):
+    """The rows picked by ``filter_rows`` as a frame; ``df`` itself when nothing is filtered."""
+    rows = filter_rows(df, manager=manager, customer=customer, entity=entity)
+    return df if rows is None else df.take(rows)
+
+
+def pivot_index(df, view):
+    """Pivot index column for a view name, falling back to Customer Name when the column is missing."""
+    index_col = VIEWS.get(view, view)
+    if index_col in ("Account Manager", ENTITY) and index_col not in df.columns:
+        index_col = "Customer Name"
+    return index_col
+
+
+def pivot_display(pivot):
+    """Pivot laid out for display, still numeric: index as a column, S.No and ``Overdue %``.
+
+    ``Overdue %`` is the oldest bucket's share of the row Total (0–100), computed per
+    column rather than per cell so the cost does not grow with the number of rows.
+    """
+    table = pivot.reset_index()
+    table.insert(0, "S.No", np.arange(1, len(table) + 1))
+    buckets = [c for c in pivot.columns if c != "Total"]
+    if buckets and "Total" in table.columns:
+        total = table["Total"].to_numpy(dtype=float)
+        oldest = table[buckets[-1]].to_numpy(dtype=float)
+        share = np.divide(oldest, total, out=np.zeros_like(total), where=total > 0)
+        table[OVERDUE_SHARE] = share * 100
+    return table
+
+
+@dataclass
+class AgingReport:
+    """Everything one workbook produces: aged invoices, their cube and the cleaning report."""
+
+    data: pd.DataFrame
+    cube: AgingCube
+    cleaning: pd.DataFrame
+
+    def pivot(self, view="Customer-wise"):
+        return self.cube.pivot(pivot_index(self.data, view))
+
+    def to_excel(self):
+        sheets = {"Aging_Pivot": self.pivot("Customer-wise")}
+        if "Account Manager" in self.data.columns:
+            sheets["AM_Summary"] = self.pivot("Account Manager Summary")
+        sheets["Raw_Filtered_Data"] = self.data
+        return export_excel(sheets)
+
+
+def build_report(raw, limits=DEFAULT_LIMITS, not_yet_due=True, today=None, mapping=None,
+                 match_threshold=DEFAULT_THRESHOLD):
+    """Run the whole pipeline on an already-read workbook frame.
+
+    Customer spellings are merged with ``CustomerClusters`` at ``match_threshold`` (the
+    dashboard's default: identical name keys only); ``None`` keeps every spelling apart.
+    """
+    limits = clean_limits(limits)
+    df, cleaning = prepare_dataset(raw, mapping)
+    if match_threshold is not None and "Customer Name" in df.columns:
+        df = CustomerClusters.from_frame(df, threshold=match_threshold).apply(df)
+    df = age_dataset(df, limits, not_yet_due=not_yet_due, today=today)
+    cube = AgingCube.build(df, bucket_labels(limits, not_yet_due=not_yet_due))
+    return AgingReport(df, cube, cleaning)
+
+
+def run_report(source, limits=DEFAULT_LIMITS, not_yet_due=True, today=None, profiles=None,
+               match_threshold=DEFAULT_THRESHOLD):
+    """Read ``source`` (path or file-like) and run the whole pipeline on it.
+
+    The header row and column mapping come from the matching profile in ``profiles``
+    (``ProfileStore.profiles()``) or are detected on the first rows; only the mapped
+    columns are parsed.
+    """
+    layout = resolve_layout(sniff_workbook(source), profiles)
+    raw = read_source(source, layout.header_row, usecols=layout.usecols)
+    return build_report(raw, limits, not_yet_due=not_yet_due, today=today, mapping=layout.mapping or None,
+                        match_threshold=match_threshold)
@@ -0,0 +1,194 @@
+"""Column-mapping profiles: a report layout's header row and mapping, remembered by fingerprint.
+
+The first rows of a workbook are read to find its header; the header names are hashed into
+a fingerprint. A layout seen before reuses its saved profile (no keyword matching, no
+Customer Name guessing) and only the mapped columns are parsed. New layouts are detected
+on those first rows and saved automatically; a user can confirm or override a profile and
+that choice sticks for every later workbook with the same header.
+
+Profiles live in one JSON file (``AR_MAPPING_PROFILES``, default ``ar_mapping_profiles.json``
+in the repository root)::
+
+    {"revision": 3, "profiles": {"<fingerprint>": {"header_row": 0, "mapping": {...},
+                                                   "confirmed": true, "saved_at": "..."}}}
+"""
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+from ar_core.columns import detect_mapping, find_header_row
+
+DEFAULT_PATH = os.environ.get(
+    "AR_MAPPING_PROFILES",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ar_mapping_profiles.json"),
+)
+MAX_SCAN = 10
+SAMPLE_ROWS = 50
+
+
+def sniff_workbook(source, rows=MAX_SCAN + SAMPLE_ROWS):
+    """The first ``rows`` rows of the first sheet, read with ``header=None``."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    head = pd.read_excel(source, header=None, nrows=rows)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return head
+
+
+def header_at(head, header_row):
+    """Stripped header names of row ``header_row`` of a sniffed frame (as ``read_workbook`` names them)."""
+    if header_row >= len(head):
+        return []
+    return [str(c).strip() if pd.notna(c) else f"Unnamed: {i}" for i, c in enumerate(head.iloc[header_row])]
+
+
+def header_fingerprint(header):
+    """Stable id of a header layout: case, spacing and cell types do not matter."""
+    text = "\x1f".join(" ".join(str(name).lower().split()) for name in header)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class Layout:
+    """Where a workbook's header is and how its columns map onto the canonical names."""
+
+    fingerprint: str
+    header_row: int
+    header: tuple
+    mapping_items: tuple  # sorted (workbook column, canonical name) pairs
+    origin: str  # "detected", "profile" (auto-saved earlier) or "confirmed" (by a user)
+
+    @property
+    def mapping(self):
+        return dict(self.mapping_items)
+
+    @property
+    def usecols(self):
+        """Columns to parse; ``None`` (all of them) when no Customer Name column is mapped."""
+        if "Customer Name" not in self.mapping.values():
+            return None
+        return [name for name in self.header if name in self.mapping]
+
+    @property
+    def key(self):
+        """Part of a dataset cache key: the same workbook read with another layout is another dataset."""
+        return (self.header_row, self.mapping_items)
+
+
+def make_layout(fingerprint, header_row, header, mapping, origin):
+    mapping = {col: canonical for col, canonical in mapping.items() if col in header}
+    return Layout(fingerprint, int(header_row), tuple(header), tuple(sorted(mapping.items())), origin)
+
+
+def resolve_layout(head, profiles=None, max_scan=MAX_SCAN):
+    """Layout of a sniffed workbook: its saved profile if the fingerprint is known, else detected."""
+    detected_row = find_header_row(head, max_scan=max_scan)
+    fingerprint = header_fingerprint(header_at(head, detected_row))
+    profile = (profiles or {}).get(fingerprint)
+    if profile is not None:
+        row = profile["header_row"]
+        origin = "confirmed" if profile.get("confirmed") else "profile"
+        return make_layout(fingerprint, row, header_at(head, row), profile["mapping"], origin)
+
+    header = header_at(head, detected_row)
+    sample = head.iloc[detected_row + 1:].set_axis(header, axis=1)
+    return make_layout(fingerprint, detected_row, header, detect_mapping(sample), "detected")
+
+
+class ProfileStore:
+    """The saved profiles, shared by every session and safe to use from several threads.
+
+    ``revision`` changes only when a user confirms, overrides or forgets a profile, so it
+    can be part of cache keys without automatic saves invalidating anything.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = {"revision": 0, "profiles": {}}
+
+    def _refresh(self):
+        """Reload the file if another process (or server) changed it."""
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return
+        stamp = (info.st_mtime_ns, info.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return  # unreadable or half-written: keep what we have
+        self._data = {"revision": int(data.get("revision", 0)), "profiles": dict(data.get("profiles", {}))}
+        self._stamp = stamp
+
+    def _write(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self._data, fh, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)  # readers see the old or the new file, never half of one
+        info = os.stat(self.path)
+        self._stamp = (info.st_mtime_ns, info.st_size)
+
+    @property
+    def revision(self):
+        with self._lock:
+            self._refresh()
+            return self._data["revision"]
+
+    def profiles(self):
+        """``{fingerprint: profile}`` (a copy, safe to hand to worker processes)."""
+        with self._lock:
+            self._refresh()
+            return dict(self._data["profiles"])
+
+    def save(self, layout, confirmed=False):
+        """Store ``layout`` as the profile of its fingerprint; ``confirmed`` marks a user's choice."""
+        with self._lock:
+            self._refresh()
+            existing = self._data["profiles"].get(layout.fingerprint)
+            if existing and existing.get("confirmed") and not confirmed:
+                return  # never let detection overwrite what a user confirmed
+            self._data["profiles"][layout.fingerprint] = {
+                "header_row": layout.header_row,
+                "mapping": layout.mapping,
+                "confirmed": confirmed,
+                "saved_at": dt.datetime.now().isoformat(timespec="seconds"),
+            }
+            if confirmed:
+                self._data["revision"] += 1
+            self._write()
+
+    def remember(self, layout):
+        """Save a freshly detected layout; a read-only profile file only costs detection next time."""
+        if layout.origin != "detected":
+            return
+        try:
+            self.save(layout)
+        except OSError:
+            pass
+
+    def forget(self, fingerprint):
+        """Drop a profile; the layout is detected again on its next load."""
+        with self._lock:
+            self._refresh()
+            if self._data["profiles"].pop(fingerprint, None) is not None:
+                self._data["revision"] += 1
+                self._write()
+
+
+def load_layout(source, store=None):
+    """Sniff ``source`` and resolve its layout, saving newly detected layouts to ``store``."""
+    layout = resolve_layout(sniff_workbook(source), store.profiles() if store is not None else None)
+    if store is not None:
+        store.remember(layout)
+    return layout
@@ -0,0 +1,136 @@
+"""Per-stage timing and memory instrumentation for one pipeline run (one dashboard rerun).
+
+    profiler = StageProfiler(enabled=True)
+    with profiler.stage("normalize", rows_in=len(raw)) as rec:
+        df, report = prepare_dataset(raw)
+        rec["rows_out"] = len(df)
+    profiler.write_log(DEFAULT_LOG)
+
+When disabled, ``stage()`` hands back a shared no-op context, so instrumented code costs
+one attribute check per stage.
+"""
+import datetime as dt
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+DEFAULT_LOG = os.environ.get(
+    "AR_DIAGNOSTICS_LOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ar_diagnostics.jsonl"),
+)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def current_rss():
+    """Resident set size of this process in bytes (None if it cannot be read cheaply)."""
+    if _PAGE_SIZE and sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "rb") as fh:
+                return int(fh.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class _NullStage:
+    """Context returned by a disabled profiler: records nothing."""
+
+    record = {}
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class StageProfiler:
+    """Collect wall time, rows in/out and memory delta for each named stage of a run.
+
+    Memory is the change in process RSS across the stage. With ``trace_allocations``
+    the stage also runs under ``tracemalloc`` and reports its own allocation peak,
+    which is more precise but slows the stage down noticeably. Stages may nest: tracing
+    runs from the outermost stage's start to its end, and each stage's peak is measured
+    above the memory traced when it started.
+    """
+
+    def __init__(self, enabled=False, trace_allocations=False):
+        self.enabled = enabled
+        self.trace_allocations = enabled and trace_allocations
+        self.records = []
+        self._peaks = []  # per open traced stage: highest traced memory seen before its last peak reset
+        self.started = time.perf_counter()
+        self.timestamp = dt.datetime.now().isoformat(timespec="seconds")
+
+    def stage(self, name, rows_in=None):
+        """Context manager timing one stage; yields a dict where ``rows_out`` etc. can be set."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._stage(name, rows_in)
+
+    @contextmanager
+    def _stage(self, name, rows_in):
+        record = {"stage": name, "rows_in": rows_in, "rows_out": None}
+        rss_before = current_rss()
+        if self.trace_allocations:
+            if self._peaks:  # nested: keep the enclosing stage's peak, then measure ours from here
+                traced_before, peak = tracemalloc.get_traced_memory()
+                self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                traced_before = 0
+            self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if self.trace_allocations:
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                record["alloc_peak_mb"] = (peak - traced_before) / 2**20
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                else:
+                    tracemalloc.stop()
+            rss_after = current_rss()
+            if rss_before is not None and rss_after is not None:
+                record["rss_delta_mb"] = (rss_after - rss_before) / 2**20
+                record["rss_mb"] = rss_after / 2**20
+            self.records.append(record)
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def to_frame(self):
+        """One row per recorded stage, in the order they ran."""
+        columns = ["stage", "seconds", "rows_in", "rows_out", "rss_delta_mb", "rss_mb", "alloc_peak_mb", "cached"]
+        frame = pd.DataFrame(self.records)
+        return frame.reindex(columns=[c for c in columns if c in frame.columns or c in ("stage", "seconds")])
+
+    def write_log(self, path=DEFAULT_LOG, **context):
+        """Append this run as one JSON line (``context`` adds fields such as the data source)."""
+        if not self.enabled:
+            return None
+        entry = {"timestamp": self.timestamp, **context,
+                 "total_seconds": round(self.total_seconds, 4), "stages": self.records}
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, default=str) + "\n")
+        return path
@@ -0,0 +1,199 @@
+"""Invoice lookup by invoice number, customer name or amount range, from indexes built once.
+
+``InvoiceSearch`` keeps three sorted structures over a frame's rows:
+
+* invoice keys (the whole number, and its digits without leading zeros, so ``148``
+  finds ``INV/00000148``), answered by prefix ranges with binary search;
+* the distinct tokens of every customer's ``name_key``, each pointing at its customers;
+* the Due Amount of every row, sorted, so an amount range is two binary searches.
+
+A lookup costs a few binary searches plus the size of the result, not a scan of the rows.
+The index is built once per dataset; ``locate`` maps its results onto any filtered subset.
+"""
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ar_core.customers import name_key
+
+_NOT_KEY = re.compile(r"\s+")
+_NOT_DIGIT = re.compile(r"\D+")
+_NO_ROWS = np.empty(0, dtype=np.intp)
+_HIGHEST = "\U0010ffff"  # sorts after every other character: "abc" .. "abc" + _HIGHEST is the "abc" prefix range
+
+
+def invoice_key(value):
+    """Comparison key of an invoice number: case and spaces folded."""
+    return _NOT_KEY.sub("", str(value)).lower()
+
+
+def invoice_digits(value):
+    """The digits of an invoice number without leading zeros ("INV/00148" -> "148")."""
+    return _NOT_DIGIT.sub("", str(value)).lstrip("0")
+
+
+def object_array_bytes(values):
+    """Size of an object array including the Python objects it points to."""
+    return int(values.nbytes) + sum(sys.getsizeof(v) for v in values)
+
+
+def _sorted_union(arrays):
+    """Sorted distinct values of several integer arrays (a sort and a neighbour compare)."""
+    values = np.sort(np.concatenate(arrays)) if arrays else _NO_ROWS
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+class _SortedKeys:
+    """Sorted string keys with the row each came from; prefix lookups by binary search."""
+
+    def __init__(self, keys, rows):
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rows = rows[order]
+
+    @property
+    def nbytes(self):
+        return object_array_bytes(self.keys) + int(self.rows.nbytes)
+
+    def prefix(self, text):
+        lo = np.searchsorted(self.keys, text, side="left")
+        hi = np.searchsorted(self.keys, text + _HIGHEST, side="left")
+        return self.rows[lo:hi]
+
+
+class InvoiceSearch:
+    """Row positions of a frame by invoice number, customer name tokens and Due Amount."""
+
+    def __init__(self, labels, invoices, digits, tokens, token_codes, customer_rows, customer_offsets, amounts,
+                 amount_rows, row_amounts):
+        self._labels = labels  # row labels of the indexed frame
+        self._invoices = invoices  # _SortedKeys of invoice_key
+        self._digits = digits  # _SortedKeys of invoice_digits
+        self._tokens = tokens  # sorted distinct customer-name tokens
+        self._token_codes = token_codes  # customer codes per token, same order
+        self._customer_rows = customer_rows  # row positions grouped by customer code
+        self._customer_offsets = customer_offsets  # customer code c owns [offsets[c], offsets[c + 1])
+        self._amounts = amounts  # sorted Due Amounts
+        self._amount_rows = amount_rows
+        self._row_amounts = row_amounts  # Due Amount in row order
+
+    @classmethod
+    def build(cls, df, invoice="Invoice No.", customer="Customer Name", amount="Due Amount"):
+        """Index every row of ``df``; results are positions into ``df``."""
+        n = len(df)
+        rows = np.arange(n, dtype=np.intp)
+        if invoice in df.columns:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+
+            present = df[invoice].notna().to_numpy()
+            text = pa.array(df[invoice].to_numpy(dtype=object)[present].astype(str), type=pa.string())
+            # invoice_key / invoice_digits for every row at once
+            keys = pc.utf8_lower(pc.replace_substring_regex(text, r"\s+", "")).to_numpy(zero_copy_only=False)
+            digits = pc.utf8_ltrim(pc.replace_substring_regex(text, r"\D+", ""), "0").to_numpy(zero_copy_only=False)
+            invoices = _SortedKeys(keys, rows[present])
+            has_digits = digits != ""
+            digits = _SortedKeys(digits[has_digits], rows[present][has_digits])
+        else:
+            invoices = digits = _SortedKeys(np.empty(0, dtype=object), _NO_ROWS)
+
+        names = df[customer] if customer in df.columns else pd.Series(pd.Categorical([None] * n))
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype("category")
+        codes = names.cat.codes.to_numpy()
+        by_token = {}
+        for code, name in enumerate(names.cat.categories):
+            for token in set(name_key(name).split()):
+                by_token.setdefault(token, []).append(code)
+        tokens = sorted(by_token)
+        token_codes = [np.array(by_token[t], dtype=np.intp) for t in tokens]
+        n_customers = len(names.cat.categories)
+        customer_rows = np.argsort(codes, kind="stable").astype(np.intp)
+        counts = np.bincount(codes[codes >= 0], minlength=n_customers)
+        skipped = int((codes < 0).sum())  # rows without a customer sort first
+        customer_offsets = np.concatenate(([0], np.cumsum(counts))) + skipped
+
+        row_amounts = df[amount].to_numpy(dtype="float64") if amount in df.columns else np.zeros(n)
+        amount_rows = np.argsort(row_amounts, kind="stable").astype(np.intp)
+        return cls(df.index, invoices, digits, np.array(tokens, dtype=object), token_codes, customer_rows,
+                   customer_offsets, row_amounts[amount_rows], amount_rows, row_amounts)
+
+    def __len__(self):
+        return len(self._labels)
+
+    @property
+    def nbytes(self):
+        """Memory held by the index, invoice key strings included."""
+        arrays = [self._customer_rows, self._customer_offsets, self._amounts, self._amount_rows, self._row_amounts]
+        return (
+            self._invoices.nbytes
+            + self._digits.nbytes
+            + object_array_bytes(self._tokens)
+            + sum(int(a.nbytes) for a in arrays + self._token_codes)
+            + int(self._labels.memory_usage(deep=True))
+        )
+
+    def by_invoice(self, text):
+        """Rows whose invoice number starts with ``text``, or whose number part does."""
+        key = invoice_key(text)
+        if not key:
+            return _NO_ROWS
+        found = [self._invoices.prefix(key)]
+        digits = invoice_digits(text)
+        if digits and digits == key.lstrip("0"):  # a bare number also matches "INV/000<number>..."
+            found.append(self._digits.prefix(digits))
+        return _sorted_union(found)
+
+    def customer_codes(self, text):
+        """Customer codes whose name has, for every word of ``text``, a word starting with it."""
+        selected = None
+        for word in name_key(text).split():
+            lo = np.searchsorted(self._tokens, word, side="left")
+            hi = np.searchsorted(self._tokens, word + _HIGHEST, side="left")
+            codes = _sorted_union(self._token_codes[lo:hi])
+            selected = codes if selected is None else np.intersect1d(selected, codes, assume_unique=True)
+            if not len(selected):
+                break
+        return _NO_ROWS if selected is None else selected
+
+    def by_customer(self, text):
+        """Rows of every customer matched by ``customer_codes(text)``."""
+        codes = self.customer_codes(text)
+        if not len(codes):
+            return _NO_ROWS
+        starts, ends = self._customer_offsets[codes], self._customer_offsets[codes + 1]
+        return np.sort(np.concatenate([self._customer_rows[s:e] for s, e in zip(starts, ends)]))
+
+    def by_amount(self, low=None, high=None):
+        """Rows with ``low <= Due Amount <= high`` (either bound may be ``None``)."""
+        lo = 0 if low is None else np.searchsorted(self._amounts, low, side="left")
+        hi = len(self._amounts) if high is None else np.searchsorted(self._amounts, high, side="right")
+        return np.sort(self._amount_rows[lo:hi])
+
+    def find(self, text="", low=None, high=None):
+        """Sorted positions matching ``text`` (invoice number or customer name) and the amount range.
+
+        An empty ``text`` and no bounds match nothing rather than every row.
+        """
+        text = str(text or "").strip()
+        if not text and low is None and high is None:
+            return _NO_ROWS
+        if not text:
+            return self.by_amount(low, high)
+        rows = _sorted_union([self.by_invoice(text), self.by_customer(text)])
+        if low is not None or high is not None:  # check the text matches' own amounts, no range scan
+            amounts = self._row_amounts[rows]
+            rows = rows[(amounts >= (-np.inf if low is None else low)) & (amounts <= (np.inf if high is None else high))]
+        return rows
+
+    def locate(self, rows, frame):
+        """Positions in ``frame`` of ``rows``, where ``frame`` is a row subset of the indexed frame.
+
+        Rows that ``frame`` does not contain (e.g. left out by ``filter_dataset``) are dropped.
+        """
+        if len(frame) == len(self._labels):
+            return rows
+        positions = frame.index.get_indexer(self._labels[rows])
+        return positions[positions >= 0]
@@ -0,0 +1,176 @@
+"""Columnar snapshot store: one Parquet partition per AR report date.
+
+Layout::
+
+    <root>/report_date=2025-11-08/part-0.parquet
+    <root>/report_date=2025-11-09/part-0.parquet
+
+Snapshots hold the normalized (mapped + typed) dataset, before aging, so any past report
+can be re-aged as of its own date and several dates can be compared side by side.
+"""
+import datetime as dt
+import os
+import re
+import shutil
+
+import pandas as pd
+
+from ar_core.export import arrow_table
+from ar_core.normalize import DATE_COLUMNS, MONEY_COLUMNS
+
+DEFAULT_ROOT = os.environ.get(
+    "AR_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ar_snapshots")
+)
+PARTITION = "report_date"
+REPORT_DATE = "Report Date"
+
+_NAME_DATE_PATTERNS = (
+    (re.compile(r"(\d{4}-\d{2}-\d{2})"), "%Y-%m-%d"),
+    (re.compile(r"(\d{1,2} [A-Za-z]{3} \d{4})"), "%d %b %Y"),
+    (re.compile(r"(\d{1,2} [A-Za-z]{4,9} \d{4})"), "%d %B %Y"),
+    (re.compile(r"(\d{1,2}[-.]\d{1,2}[-.]\d{4})"), "%d-%m-%Y"),
+)
+
+
+def report_date_from_name(name, default=None):
+    """Report date embedded in a file name such as '08 Nov 2025 AR Report Final.xlsx'."""
+    base = os.path.basename(str(name))
+    for pattern, fmt in _NAME_DATE_PATTERNS:
+        match = pattern.search(base)
+        if match:
+            try:
+                return dt.datetime.strptime(match.group(1).replace(".", "-"), fmt).date()
+            except ValueError:
+                continue
+    return default
+
+
+def unified_schema(schemas):
+    """One schema for several snapshots; a column whose types cannot be promoted becomes text.
+
+    Snapshots written before every unmapped column was stored as text may hold e.g.
+    ``Invoice No.`` as int64 in one report and as strings in another.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, []).append(field.type)
+    fields = []
+    for name, found in types.items():
+        try:
+            field = pa.unify_schemas([pa.schema([(name, t)]) for t in found], promote_options="permissive")[0]
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            field = pa.field(name, pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+class SnapshotStore:
+    """Write normalized AR datasets once and read them back by date or date range."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def _partition_dir(self, report_date):
+        return os.path.join(self.root, f"{PARTITION}={pd.Timestamp(report_date).date().isoformat()}")
+
+    def write(self, df, report_date):
+        """Store ``df`` as the snapshot for ``report_date``, replacing any earlier one."""
+        import pyarrow.parquet as pq
+
+        target = self._partition_dir(report_date)
+        tmp = target + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        # Only the typed canonical columns keep their types; the rest (Invoice No., S.No, ...)
+        # are text, so every snapshot has the same schema whatever one report's cells held
+        text_columns = [c for c in df.columns if c not in MONEY_COLUMNS + DATE_COLUMNS]
+        table = arrow_table(df, text_columns=text_columns)
+        pq.write_table(table, os.path.join(tmp, "part-0.parquet"), compression="zstd")
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        return target
+
+    def dates(self):
+        """Sorted report dates that have a snapshot."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            if name.startswith(PARTITION + "=") and not name.endswith(".tmp"):
+                try:
+                    found.append(dt.date.fromisoformat(name.split("=", 1)[1]))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    def version(self, report_date):
+        """Modification stamp of one snapshot (changes whenever it is rewritten)."""
+        path = os.path.join(self._partition_dir(report_date), "part-0.parquet")
+        return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+    def _dataset(self, dates):
+        """Dataset over the snapshots of ``dates`` only; see ``unified_schema`` for type conflicts."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        files = [os.path.join(self._partition_dir(d), "part-0.parquet") for d in dates]
+        partitioning = ds.partitioning(pa.schema([(PARTITION, pa.date32())]), flavor="hive")
+        schema = unified_schema([pq.read_schema(f) for f in files])
+        schema = schema.append(pa.field(PARTITION, pa.date32()))
+        return ds.dataset(files, schema=schema, format="parquet", partitioning=partitioning,
+                          partition_base_dir=self.root)
+
+    def load(self, start, end=None, columns=None, customers=None, managers=None):
+        """Load one report date (or the inclusive ``start``..``end`` range).
+
+        ``columns`` projects the read to those columns; ``customers`` / ``managers`` are
+        pushed down to the Parquet scan as ``isin`` filters. The result carries a
+        ``Report Date`` column.
+        """
+        import pyarrow.dataset as ds
+
+        if not self.dates():
+            raise FileNotFoundError(f"No snapshots in {self.root}")
+        start = pd.Timestamp(start).date()
+        end = pd.Timestamp(end).date() if end is not None else start
+        dates = [d for d in self.dates() if start <= d <= end]
+        if not dates:
+            return pd.DataFrame(columns=[c for c in columns or [] if c != PARTITION] + [REPORT_DATE])
+
+        dataset = self._dataset(dates)
+        expr = (ds.field(PARTITION) >= start) & (ds.field(PARTITION) <= end)
+        if customers:
+            expr &= ds.field("Customer Name").isin(list(customers))
+        if managers and "Account Manager" in dataset.schema.names:
+            expr &= ds.field("Account Manager").isin(list(managers))
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names and c != PARTITION] + [PARTITION]
+
+        df = dataset.to_table(columns=columns, filter=expr).to_pandas(coerce_temporal_nanoseconds=True)
+        df = df.rename(columns={PARTITION: REPORT_DATE})
+        df[REPORT_DATE] = pd.to_datetime(df[REPORT_DATE])
+        return df
+
+
+def aging_history(df, limits, not_yet_due=True, value="Due Amount"):
+    """Report Date × Aging Bucket totals, each snapshot aged as of its own report date."""
+    from ar_core.aging import age_days
+
+    days = (df[REPORT_DATE] - df["Due Date"]).dt.days.fillna(0)
+    buckets = age_days(days, limits, not_yet_due=not_yet_due)
+    history = (
+        df[value]
+        .groupby([df[REPORT_DATE], buckets], observed=False)
+        .sum()
+        .unstack(fill_value=0)
+    )
+    history["Total"] = history.sum(axis=1)
+    return history
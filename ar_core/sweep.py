@@ -0,0 +1,140 @@
+"""What-if bucket sweeps: any bucket configuration answered without re-aging the invoices.
+
+``BucketIndex`` sorts the invoices once by days overdue within each (Entity,) Account
+Manager × Customer group and keeps running totals of the money columns in that order.
+Each bucket boundary then costs one binary search per group, and a bucket total is the
+difference of two running totals. Changing the limits costs O(groups × buckets × log n),
+whatever the number of invoices.
+"""
+import numpy as np
+import pandas as pd
+
+from ar_core.aging import bucket_labels, clean_limits, days_overdue
+from ar_core.cube import COUNT, MEASURES, AgingCube, group_dimensions, measure_frame
+
+
+class BucketIndex:
+    """Invoices sorted by (group, days overdue) with prefix sums of every measure.
+
+    Built once per dataset and report date; ``days`` holds Days Overdue in the original
+    row order so row-level aging can reuse it.
+    """
+
+    def __init__(self, groups, keys, span, offset, prefix, days):
+        self.groups = groups  # one row per group: its dimension values, in sorted order
+        self._keys = keys  # group id * span + (days - offset), ascending
+        self._span = span
+        self._offset = offset
+        self._prefix = prefix  # {measure: running totals, with a leading 0}
+        self.days = days
+
+    @classmethod
+    def build(cls, df, today=None):
+        """Index a prepared (not yet aged) invoice frame as of ``today``."""
+        days = days_overdue(df["Due Date"], today=today).to_numpy()
+        frame = measure_frame(df)
+        grouped = frame.groupby(group_dimensions(df), observed=True, sort=True)
+        group_ids = grouped.ngroup().to_numpy()
+        groups = grouped.size().index.to_frame(index=False)
+
+        offset = int(days.min()) if len(days) else 0
+        span = (int(days.max()) - offset + 2) if len(days) else 2
+        keys = group_ids.astype("int64") * span + (days - offset)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+        prefix = {}
+        for col in list(MEASURES) + [COUNT]:
+            values = frame[col].to_numpy()[order]
+            prefix[col] = np.concatenate(([0], np.cumsum(values)))
+        return cls(groups, keys, span, offset, prefix, days)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def nbytes(self):
+        """Memory held by the index: its arrays and the group table."""
+        arrays = [self._keys, self.days] + list(self._prefix.values())
+        return sum(int(a.nbytes) for a in arrays) + int(self.groups.memory_usage(index=True, deep=True).sum())
+
+    def group_mask(self, manager=None, customer=None, entity=None):
+        """Boolean mask over ``groups`` for one Account Manager, Customer and/or Entity."""
+        mask = np.ones(len(self.groups), dtype=bool)
+        for column, value in (("Entity", entity), ("Account Manager", manager), ("Customer Name", customer)):
+            if value not in (None, "All") and column in self.groups.columns:
+                mask &= (self.groups[column] == value).to_numpy()
+        return mask
+
+    @property
+    def day_range(self):
+        """Smallest and largest Days Overdue in the index."""
+        return self._offset, self._offset + self._span - 2
+
+    def _cuts(self, edges, group_ids):
+        """Positions in sorted order where each segment starts/ends, shape (groups, len(edges) + 2)."""
+        base = group_ids.astype("int64")[:, None] * self._span
+        # clipping keeps every probe inside its own group's key range
+        probes = np.clip(np.asarray(edges, dtype="int64") - self._offset, -1, self._span - 1)
+        inner = np.searchsorted(self._keys, base + probes[None, :], side="right")
+        start = np.searchsorted(self._keys, base[:, 0] - 1, side="right")
+        end = np.searchsorted(self._keys, base[:, 0] + self._span - 1, side="right")
+        return np.column_stack([start, inner, end])
+
+    def segment_sums(self, edges, groups=None):
+        """``{measure: (groups, len(edges) + 1) array}`` of totals per Days Overdue segment.
+
+        ``edges`` are ascending day counts; segment k holds ``edges[k-1] < days <= edges[k]``,
+        the first and last segments are open-ended.
+        """
+        group_ids = np.arange(len(self.groups)) if groups is None else np.flatnonzero(groups)
+        cuts = self._cuts(edges, group_ids)
+        return {col: np.diff(prefix[cuts], axis=1) for col, prefix in self._prefix.items()}
+
+    def sums(self, limits, not_yet_due=True, groups=None):
+        """``{measure: (groups, buckets) array}`` of bucket totals for the selected groups."""
+        # Bucket k holds limits[k-1] < days <= limits[k]; "Not Yet Due" holds days <= -1
+        edges = ([-1] if not_yet_due else []) + clean_limits(limits)
+        return self.segment_sums(edges, groups)
+
+    def cube(self, limits, not_yet_due=True):
+        """The ``AgingCube`` that ``AgingCube.build`` would produce for this configuration."""
+        labels = bucket_labels(limits, not_yet_due=not_yet_due)
+        sums = self.sums(limits, not_yet_due)
+        n_groups, n_buckets = sums[COUNT].shape
+        levels = [self.groups[col].repeat(n_buckets).array for col in self.groups.columns]
+        buckets = pd.Categorical.from_codes(np.tile(np.arange(n_buckets), n_groups), categories=labels, ordered=True)
+        index = pd.MultiIndex.from_arrays(levels + [buckets], names=list(self.groups.columns) + ["Aging Bucket"])
+        table = pd.DataFrame({col: values.ravel() for col, values in sums.items()}, index=index)
+        table = table[table[COUNT].to_numpy() > 0]  # only the combinations that occur, like groupby(observed=True)
+        return AgingCube(table, labels)
+
+    def bucket_totals(self, limits, not_yet_due=True, groups=None, value="Due Amount"):
+        """Total ``value`` per bucket over the selected groups, in bucket order."""
+        totals = self.sums(limits, not_yet_due, groups)[value].sum(axis=0)
+        return pd.Series(totals, index=bucket_labels(limits, not_yet_due=not_yet_due), name=value)
+
+
+def config_label(limits):
+    return "/".join(map(str, clean_limits(limits)))
+
+
+def compare_configurations(index, configs, not_yet_due=True, groups=None, value="Due Amount"):
+    """Long table (Configuration, Bucket, ``value``, Share %) for several bucket configurations."""
+    frames = []
+    for limits in configs:
+        totals = index.bucket_totals(limits, not_yet_due, groups, value)
+        total = totals.sum()
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Configuration": config_label(limits),
+                    "Bucket": totals.index,
+                    value: totals.to_numpy(),
+                    "Share %": totals.to_numpy() / total * 100 if total else 0.0,
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["Configuration", "Bucket", value, "Share %"]
+    )
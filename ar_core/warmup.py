@@ -0,0 +1,83 @@
+"""Cold-start warm-up: import the heavy optional modules and preload the default linked report.
+
+Streamlit has no server-start hook, so the dashboard (with ``AR_WARMUP=1``) starts
+``warm_up`` in a background thread on the first script run of a server process; the
+report then lands in the shared cache under the keys every session looks up. From the
+command line it reports the same timings for a cold process:
+
+    python -m ar_core.warmup "D:/AR Reports/08 Nov 2025 AR Report Final.xlsx"
+"""
+import argparse
+import importlib
+import sys
+import time
+
+from ar_core.ingest import WorkbookCache, source_key
+from ar_core.profiles import load_layout
+from ar_core.watcher import preload_report, resolve_report, workbook_key
+
+# Imported on demand by the dashboard (grid, Excel reading/export, charts, Parquet)
+HEAVY_MODULES = ("openpyxl", "st_aggrid", "plotly.graph_objects", "pyarrow")
+
+
+def import_timings(modules=HEAVY_MODULES):
+    """Import ``modules``; ``{module: seconds}`` (``None`` if not installed, ~0 if already imported)."""
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def warm_up(cache, path, store=None, low_memory=False, modules=HEAVY_MODULES, **preload_options):
+    """Import ``modules``, then prepare, age and aggregate the report at ``path`` into ``cache``.
+
+    ``path`` may be a folder (its newest workbook is used); ``low_memory`` and
+    ``preload_options`` go to ``preload_report``. Returns ``{"imports": {...}, "report": path,
+    "layout": s, "preload": s, "total": s}``; raises ``FileNotFoundError`` when there is no
+    workbook at ``path``.
+    """
+    start = time.perf_counter()
+    timings = {"imports": import_timings(modules)}
+    target = resolve_report(path)
+    if target is None:
+        raise FileNotFoundError(f"No Excel workbook found at {path}")
+    timings["report"] = target
+
+    step = time.perf_counter()
+    layout = load_layout(target, store)
+    timings["layout"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    key = workbook_key(source_key(target), layout, low_memory=low_memory)
+    preload_report(cache, target, key, layout=layout, low_memory=low_memory, **preload_options)
+    timings["preload"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard's cold start: heavy imports and report preload.")
+    parser.add_argument("path", help="linked AR workbook, or a folder (its newest workbook is used)")
+    parser.add_argument("--low-memory", action="store_true", help="prepare the report in low-memory mode")
+    args = parser.parse_args(argv)
+
+    try:
+        timings = warm_up(WorkbookCache(), args.path, low_memory=args.low_memory)
+    except (OSError, ValueError) as exc:
+        print(f"{type(exc).__name__}: {exc}", file=sys.stderr)
+        return 1
+    for name, seconds in timings["imports"].items():
+        print(f"import {name:<22} {'not installed' if seconds is None else f'{seconds:.3f}s'}")
+    print(f"layout {timings['layout']:.3f}s, preload {timings['preload']:.3f}s ({timings['report']})")
+    print(f"total {timings['total']:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Background watcher for the linked AR report (a file, or the newest workbook in a folder).
+
+The watcher polls the path, and when a new version appears it waits for the file to settle,
+copies it, prepares the copy off the request path and only then swaps it in; until that
+finishes, readers keep getting the previous version. Each version is read from its own copy,
+so its cache key always describes the bytes behind it, even after the linked file changes
+again. Partially written files (OneDrive / network sync) are retried instead of failing the
+dashboard.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from ar_core.aging import DEFAULT_LIMITS
+from ar_core.batch import find_workbooks
+from ar_core.customers import DEFAULT_THRESHOLD, CustomerClusters
+from ar_core.ingest import read_source, source_key
+from ar_core.pipeline import age_dataset, prepare_dataset
+from ar_core.sweep import BucketIndex
+
+# Errors a half-synced or locked workbook produces while it is being written
+PARTIAL_FILE_ERRORS = (zipfile.BadZipFile, EOFError, OSError, KeyError, ValueError)
+
+
+def resolve_report(path):
+    """``path`` itself if it is a file, else the most recently modified workbook in that folder."""
+    if not os.path.isdir(path):
+        return path if os.path.exists(path) else None
+    workbooks = find_workbooks(path)
+    return max(workbooks, key=os.path.getmtime) if workbooks else None
+
+
+def check_complete(path):
+    """Raise if ``path`` is still being written: an .xlsx must open as a complete zip archive."""
+    with open(path, "rb") as fh:
+        if not fh.read(1):
+            raise EOFError(f"{os.path.basename(path)} is empty")
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        with zipfile.ZipFile(path) as zf:
+            zf.getinfo("[Content_Types].xml")
+
+
+def copy_version(target, key, folder):
+    """Copy ``target`` (whose ``source_key`` is ``key``) into ``folder``; raise if it changes meanwhile."""
+    copy = os.path.join(folder, f"{key[2]}-{key[3]}-{os.path.basename(target)}")
+    shutil.copyfile(target, copy)
+    if source_key(target) != key:
+        os.remove(copy)
+        raise OSError(f"{os.path.basename(target)} changed while it was being copied")
+    check_complete(copy)
+    return copy
+
+
+def workbook_key(base_key, layout, streaming=False, low_memory=False):
+    """Dataset key of a workbook (``source_key``) read with ``layout`` in the given reader modes."""
+    return base_key + layout.key + (streaming,) + (("low_memory",) if low_memory else ())
+
+
+def prepared_key(dataset_key):
+    """Cache key of a dataset's prepared (mapped + normalized) frame."""
+    return ("prepared",) + dataset_key
+
+
+def clusters_key(dataset_key, threshold):
+    """Cache key of a dataset's ``CustomerClusters`` at one similarity threshold."""
+    return ("clusters",) + dataset_key + (threshold,)
+
+
+def customer_key(dataset_key, threshold):
+    """Dataset key after customer-name merging (``threshold=None``: names left as they are)."""
+    return dataset_key + ("customers", threshold)
+
+
+def bucket_index_key(dataset_key, today):
+    """Cache key of a dataset's ``BucketIndex`` as of ``today``."""
+    return ("bucket_index",) + dataset_key + (today,)
+
+
+def aging_keys(dataset_key, limits, not_yet_due, today):
+    """Cache keys of the aged frame and the cube of one dataset + bucket configuration."""
+    cube_key = (dataset_key, tuple(limits), not_yet_due, today)
+    return ("aged",) + cube_key, ("cube",) + cube_key
+
+
+def preload_report(cache, path, dataset_key, layout=None, limits=DEFAULT_LIMITS, not_yet_due=True, today=None,
+                   threshold=DEFAULT_THRESHOLD, low_memory=False):
+    """Prepare, age and aggregate ``path`` into ``cache`` under the dashboard's keys.
+
+    ``layout`` (from ``ar_core.profiles``) gives the header row and column mapping;
+    ``threshold`` is the customer-name merging similarity (``None`` to leave names as they are);
+    ``low_memory`` is passed on to ``prepare_dataset``.
+    """
+    limits = list(limits)
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now().date())
+    header_row, usecols, mapping = (layout.header_row, layout.usecols, layout.mapping or None) if layout else (0, None, None)
+    df, _ = cache.get_or_load(
+        prepared_key(dataset_key), lambda: prepare_dataset(read_source(path, header_row, usecols=usecols), mapping, low_memory)
+    )
+    if threshold is not None:
+        clusters = cache.get_or_load(
+            clusters_key(dataset_key, threshold), lambda: CustomerClusters.from_frame(df, threshold=threshold)
+        )
+        df = clusters.apply(df)
+    dataset_key = customer_key(dataset_key, threshold)
+    aged_key, cube_key = aging_keys(dataset_key, limits, not_yet_due, today)
+    index = cache.get_or_load(bucket_index_key(dataset_key, today), lambda: BucketIndex.build(df, today))
+    cache.get_or_load(aged_key, lambda: age_dataset(df, limits, not_yet_due=not_yet_due, today=today, days=index.days))
+    cache.get_or_load(cube_key, lambda: index.cube(limits, not_yet_due=not_yet_due))
+
+
+@dataclass(frozen=True)
+class ReportVersion:
+    """One fully loaded version of the linked report."""
+
+    path: str  # private copy of the version, read instead of the linked file
+    key: tuple  # ``source_key`` of the linked file when it was copied
+    loaded_at: float = field(default_factory=time.time)
+    original: str = ""  # the linked file itself
+
+
+class LinkedFileWatcher(threading.Thread):
+    """Poll ``path`` and run ``preload(path, key)`` for every new, settled version.
+
+    ``current()`` returns the last version whose preload succeeded. A changed file is only
+    loaded once it has settled (same size and mtime for ``settle`` seconds) and opens
+    cleanly; failed loads are retried with back-off up to ``max_retries`` times. Versions
+    are copied into a private folder (the current and the previous one are kept) and
+    ``preload`` is given the copy.
+    """
+
+    def __init__(self, path, preload, interval=5.0, settle=2.0, max_retries=5, retry_delay=5.0):
+        super().__init__(name=f"ar-watch:{os.path.basename(path) or path}", daemon=True)
+        self.path = path
+        self.preload = preload
+        self.interval = interval
+        self.settle = settle
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.pending = None  # (path, key) seen on disk but not loaded yet
+        self.last_error = None
+        self.loads = 0
+        self._current = None
+        self._seen = None  # (path, key, first seen at)
+        self._attempts = 0
+        self._next_try = 0.0
+        self._stopped = threading.Event()
+        self._copies = tempfile.mkdtemp(prefix="ar-watch-")
+
+    def current(self):
+        return self._current
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception as exc:  # keep watching; the error is shown to users
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            self._stopped.wait(self.interval)
+        shutil.rmtree(self._copies, ignore_errors=True)
+
+    def poll(self):
+        """One polling step (also usable synchronously, e.g. to load the first version)."""
+        try:
+            target = resolve_report(self.path)
+            key = source_key(target) if target else None
+        except OSError as exc:  # file vanished between listing and stat
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            return
+        if key is None:
+            return
+        if self._current is not None and self._current.key == key:
+            self.pending = None
+            return
+
+        now = time.monotonic()
+        if self._seen is None or self._seen[1] != key:
+            self._seen = (target, key, now)  # new or still changing: wait for it to settle
+            self._attempts, self._next_try = 0, 0.0
+            self.pending = (target, key)
+        # settled: unchanged for `settle` seconds, or last modified longer ago than that
+        settled = now - self._seen[2] >= self.settle or time.time() - key[2] / 1e9 >= self.settle
+        if not settled or now < self._next_try or self._attempts > self.max_retries:
+            return
+
+        try:
+            check_complete(target)
+            copy = copy_version(target, key, self._copies)
+            self.preload(copy, key)
+        except PARTIAL_FILE_ERRORS as exc:
+            self._attempts += 1
+            self._next_try = now + self.retry_delay * self._attempts
+            self.last_error = f"{os.path.basename(target)}: {type(exc).__name__}: {exc}"
+            if self._attempts > self.max_retries:  # give up on this version until the file changes again
+                self.pending = None
+                self.last_error += f" (gave up after {self._attempts} attempts)"
+            return
+        previous, self._current = self._current, ReportVersion(copy, key, original=target)  # atomic swap
+        self._discard_copies(keep=(copy, previous.path if previous else None))
+        self.pending = None
+        self.last_error = None
+        self.loads += 1
+
+
+    def _discard_copies(self, keep):
+        """Delete the copies of older versions (a session may still be reading the previous one)."""
+        for name in os.listdir(self._copies):
+            path = os.path.join(self._copies, name)
+            if path not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class WatcherPool:
+    """Linked-file watchers shared by every session: one per path, stopped once unused.
+
+    A session ``acquire``s the path it watches on every rerun (which releases any other
+    path it held) and ``release``s it when it stops watching. A watcher is stopped when its
+    last session releases it or has not acquired it for ``idle_timeout`` seconds (a closed
+    browser tab never releases), and at most ``max_watchers`` run at once, the least
+    recently used being stopped first. ``start(path)`` returns a started watcher.
+    """
+
+    def __init__(self, start, max_watchers=8, idle_timeout=900.0):
+        self.start = start
+        self.max_watchers = max_watchers
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._watchers = {}  # path -> watcher, least recently used first
+        self._holders = {}  # path -> {session: monotonic time of its last acquire}
+
+    def __len__(self):
+        return len(self._watchers)
+
+    def acquire(self, path, session):
+        """The running watcher of ``path`` (started if needed), held for ``session``."""
+        with self._lock:
+            now = time.monotonic()
+            self._release(session, keep=path)
+            self._expire(now)
+            watcher = self._watchers.pop(path, None)
+            if watcher is None or not watcher.is_alive():
+                watcher = self.start(path)
+            self._watchers[path] = watcher
+            self._holders.setdefault(path, {})[session] = now
+            while len(self._watchers) > self.max_watchers:
+                self._stop(next(iter(self._watchers)))
+            return watcher
+
+    def release(self, session):
+        """Stop holding any path for ``session``; watchers nobody else holds are stopped."""
+        with self._lock:
+            self._release(session)
+
+    def _release(self, session, keep=None):
+        for path, holders in list(self._holders.items()):
+            if path != keep and holders.pop(session, None) is not None and not holders:
+                self._stop(path)
+
+    def _expire(self, now):
+        for path, holders in list(self._holders.items()):
+            for session, seen in list(holders.items()):
+                if now - seen > self.idle_timeout:
+                    del holders[session]
+            if not holders:
+                self._stop(path)
+
+    def _stop(self, path):
+        self._holders.pop(path, None)
+        watcher = self._watchers.pop(path, None)
+        if watcher is not None:
+            watcher.stop()
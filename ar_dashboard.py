@@ -1,15 +1,79 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from st_aggrid import AgGrid, GridOptionsBuilder
 from datetime import datetime
-import io
 import os
+import threading
+import time
+import uuid
+
+from ar_core import (
+    COLUMN_KEYWORDS,
+    DEFAULT_LIMITS,
+    OVERDUE_SHARE,
+    ColumnMappingError,
+    StageGraph,
+    WorkbookCache,
+    age_dataset,
+    bucket_labels,
+    clean_limits,
+    consolidate,
+    filter_rows,
+    pivot_display,
+    pivot_index,
+    prepare_dataset,
+    read_source,
+    source_key,
+)
+from ar_core.batch import find_workbooks
+from ar_core.charts import (
+    DEFAULT_TOP,
+    FREQUENCIES,
+    due_date_timeline,
+    stacked_bucket_figure,
+    timeline_figure,
+    top_n_buckets,
+)
+from ar_core.consolidate import entity_names
+from ar_core.customers import DEFAULT_THRESHOLD, FUZZY_THRESHOLD, CustomerClusters
+from ar_core.detail import DETAIL_COLUMNS, PAGE_SIZES, customer_rows, page_count, page_frame, select_rows
+from ar_core.export import EXPORT_FORMATS, EXPORT_TABLES, export_report
+from ar_core.profiles import ProfileStore, header_at, load_layout, make_layout, sniff_workbook
+from ar_core.profiling import DEFAULT_LOG, StageProfiler
+from ar_core.search import InvoiceSearch
+from ar_core.snapshots import SnapshotStore, aging_history, report_date_from_name
+from ar_core.sweep import BucketIndex, compare_configurations, config_label
+from ar_core.warmup import warm_up
+from ar_core.watcher import (
+    PARTIAL_FILE_ERRORS,
+    LinkedFileWatcher,
+    WatcherPool,
+    aging_keys,
+    bucket_index_key,
+    clusters_key,
+    customer_key,
+    preload_report,
+    prepared_key,
+    check_complete,
+    resolve_report,
+    workbook_key,
+)
 
 st.set_page_config(page_title="AR Dashboard", layout="wide")
 
 
 # ✅ MUST be the first Streamlit call
 
+# ---------------------------------------------------------------
+# 🩺 Diagnostics (per-stage timings for this rerun; off by default)
+# ---------------------------------------------------------------
+with st.sidebar:
+    show_diagnostics = st.toggle("🩺 Diagnostics", value=False, help="Time each pipeline stage and log it")
+    trace_allocations = show_diagnostics and st.checkbox(
+        "Trace allocations (tracemalloc, slower)", value=False
+    )
+profiler = StageProfiler(enabled=show_diagnostics, trace_allocations=trace_allocations)
+
 
 # ---------------------------------------------------------------
 # 🏢 Company Header
@@ -134,383 +198,720 @@ st.markdown(
 # ---------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------
-def safe_currency(x):
-    try:
-        v = float(str(x).replace("₹", "").replace(",", "").strip())
-        return f"₹{v:,.0f}"
-    except:
-        return "-"
+SHARED_CACHE_MB = float(os.environ.get("AR_SHARED_CACHE_MB", 1024))
+SHARED_CACHE_ENTRIES = int(os.environ.get("AR_SHARED_CACHE_ENTRIES", 32))
+DEFAULT_LINKED_PATH = os.environ.get(
+    "AR_LINKED_PATH", r"C:\Users\Rinku.soni\OneDrive - DEV IT SERV\Desktop\AR Dashboard\08 Nov 2025 AR Report Final.xlsx"
+)
+# AR_WARMUP=1: the first run of a server process preloads DEFAULT_LINKED_PATH in the background
+WARMUP = os.environ.get("AR_WARMUP", "").strip().lower() in ("1", "true", "yes")
+# AR_LOW_MEMORY=1: low-memory mode is on by default (and used by the background preloads)
+SYNC_RETRIES = 12  # a linked file still being written is retried this many times, SYNC_RETRY_SECONDS apart
+SYNC_RETRY_SECONDS = 5
+LOW_MEMORY = os.environ.get("AR_LOW_MEMORY", "").strip().lower() in ("1", "true", "yes")
 
-def highlight_overdue(row):
-    """Highlight overdue rows safely, even if key columns are missing."""
-    overdue_col = f">{bucket_def[-1][1]} Days"
-    overdue = row.get(overdue_col, 0)
 
-    try:
-        overdue_val = float(str(overdue).replace("₹", "").replace(",", "").strip())
-    except Exception:
-        overdue_val = 0.0
-
-    key_name = None
-    for possible in ["Customer Name", "Account Manager", "S.No"]:
-        if possible in row.index:
-            key_name = possible
-            break
-
-    key_value = str(row.get(key_name, "")).strip() if key_name else ""
-    color = "background-color: #ffe6e6;" if (overdue_val > 0 and key_value != "Grand Total") else ""
-    return [color] * len(row)
-
-def find_header_row(raw, max_scan=10):
-    keywords = ["customer", "invoice", "due", "amount", "payment"]
-    for i in range(min(max_scan, len(raw))):
-        row = [str(x).lower() for x in raw.iloc[i].fillna("")]
-        hits = sum(any(k in cell for cell in row) for k in keywords)
-        if hits >= 2:
-            return i
-    return 0
-
-def bucket_category(days, buckets):
-    """Categorize safely; never fails even if inputs are strings."""
-    # Force numeric for the "days" value
-    try:
-        d = float(str(days).replace(",", "").strip())
-    except Exception:
-        d = 0.0
+@st.cache_resource
+def shared_dataset_cache():
+    """One dataset cache for every session of this server, LRU within a memory budget."""
+    return WorkbookCache(max_entries=SHARED_CACHE_ENTRIES, max_bytes=SHARED_CACHE_MB * 2**20)
 
-    # Build a clean numeric bucket list
-    safe_buckets = []
-    for label, limit in buckets:
-        try:
-            lim = float(str(limit).replace(",", "").strip())
-        except Exception:
-            lim = 0.0
-        safe_buckets.append((label, lim))
 
-    # Defensive comparison
-    for label, limit in safe_buckets:
+@st.cache_resource
+def mapping_profiles():
+    """Column-mapping profiles shared by every session, keyed by header fingerprint."""
+    return ProfileStore()
+
+
+@st.cache_resource
+def linked_watchers():
+    """Background watchers of the linked paths sessions watch, preloading new versions into the shared cache."""
+
+    def preload(target, key):
+        layout = load_layout(target, mapping_profiles())
+        dataset_key = workbook_key(key, layout, low_memory=LOW_MEMORY)
+        preload_report(shared_dataset_cache(), target, dataset_key, layout=layout, low_memory=LOW_MEMORY)
+
+    def start(path):
+        watcher = LinkedFileWatcher(path, preload)
+        watcher.start()
+        return watcher
+
+    return WatcherPool(start)
+
+
+def wait_for_sync(path, exc):
+    """Stop this run while the linked file is still being written (OneDrive / network sync) and rerun.
+
+    After ``SYNC_RETRIES`` attempts the error is shown instead.
+    """
+    name = os.path.basename(path)
+    retries = st.session_state.get("sync_retries", 0)
+    if retries >= SYNC_RETRIES:
+        st.session_state["sync_retries"] = 0
+        st.error(f"❌ {name} could not be read: {type(exc).__name__}: {exc}")
+        st.stop()
+    st.session_state["sync_retries"] = retries + 1
+    st.warning(f"⏳ {name} is still being written (syncing?); retrying in {SYNC_RETRY_SECONDS} s…")
+    time.sleep(SYNC_RETRY_SECONDS)
+    st.rerun()
+
+
+def money_columns(columns, decimals=0):
+    """Column config showing money columns as grouped numbers at render time (they stay numeric)."""
+    return {
+        col: st.column_config.NumberColumn(f"{col} (₹)", step=1 if decimals == 0 else 10 ** -decimals)
+        for col in columns
+    }
+
+
+# AgGrid formatters for the invoice detail page (run in the browser, per visible cell); wrapped
+# in JsCode where the grid is built, so st_aggrid is only imported once a grid is shown
+INR_FORMATTER = """
+function(params) {
+    if (params.value === null || params.value === undefined) { return ""; }
+    return "₹" + Number(params.value).toLocaleString("en-US", {minimumFractionDigits: 2, maximumFractionDigits: 2});
+}
+"""
+DATE_FORMATTER = """
+function(params) { return params.value ? String(params.value).substring(0, 10) : ""; }
+"""
+
+
+@st.cache_resource
+def server_warmup():
+    """Warm this server process once, in the background: heavy imports, then the default linked report.
+
+    Sessions that open the same report meanwhile wait for the load in progress instead of
+    starting another one; the returned dict fills in with the timings when it finishes.
+    """
+    status = {"started": datetime.now()}
+    cache, store = shared_dataset_cache(), mapping_profiles()
+
+    def run():
         try:
-            if float(d) <= float(limit):
-                return label
-        except Exception as e:
-            # Debugging aid – prints the pair that failed
-            st.warning(f"⚠️ Comparison failed for days={days} (type {type(days)}) and limit={limit} (type {type(limit)})")
-            return f"ErrorBucket({days})"
+            status.update(warm_up(cache, DEFAULT_LINKED_PATH, store, low_memory=LOW_MEMORY))
+        except Exception as exc:  # a missing default report must not break the dashboard
+            status["error"] = f"{type(exc).__name__}: {exc}"
+        status["done"] = True
+
+    threading.Thread(target=run, name="ar-warmup", daemon=True).start()
+    return status
+
 
-    # If all else fails, return the final bucket
-    return f">{safe_buckets[-1][1]:.0f} Days"
+warmup_status = server_warmup() if WARMUP else None
 
 
 # ---------------------------------------------------------------
 # Excel Data Source
 # ---------------------------------------------------------------
-data_mode = st.radio("📊 Select data source mode:", ["Upload Excel", "Linked Excel File"], horizontal=True)
+data_mode = st.radio(
+    "📊 Select data source mode:",
+    ["Upload Excel", "Linked Excel File", "Consolidate Entities", "Snapshot History"],
+    horizontal=True,
+)
+
+if "watch_session" not in st.session_state:
+    st.session_state["watch_session"] = uuid.uuid4().hex  # holds this session's linked-file watcher
+watch_session = st.session_state["watch_session"]
+if data_mode != "Linked Excel File":
+    linked_watchers().release(watch_session)
+
+snapshot_store = SnapshotStore()
+snapshot_date = None
+linked_version = None
+entity_sources = None  # {entity: path or uploaded bytes} in consolidation mode
+private_data = data_mode == "Upload Excel"
 
 if data_mode == "Upload Excel":
     uploaded = st.file_uploader("📂 Upload AR Excel file", type=["xlsx", "xls"])
     if not uploaded:
         st.info("Upload your AR Excel file to view the dashboard.")
         st.stop()
-    raw = pd.read_excel(uploaded, header=None, dtype=str)
+    source = uploaded
 
-else:
-    st.info("Using linked Excel file path below:")
-    default_path = r"C:\Users\Rinku.soni\OneDrive - DEV IT SERV\Desktop\AR Dashboard\08 Nov 2025 AR Report Final.xlsx"
-    file_path = st.text_input("🔗 Excel file path:", default_path)
+elif data_mode == "Linked Excel File":
+    st.info("Using linked Excel file path below (a folder uses its newest workbook):")
+    file_path = st.text_input("🔗 Excel file path:", DEFAULT_LINKED_PATH)
 
     if not os.path.exists(file_path):
+        linked_watchers().release(watch_session)
         st.error(f"❌ File not found: {file_path}")
         st.stop()
+    if st.checkbox("👀 Watch for new versions and preload them in the background", value=True):
+        watcher = linked_watchers().acquire(file_path, watch_session)
+        linked_version = watcher.current()
+        if watcher.pending and linked_version:
+            loaded_at = datetime.fromtimestamp(linked_version.loaded_at).strftime("%H:%M:%S")
+            st.caption(f"🔄 A newer version is being prepared in the background; showing the one loaded at {loaded_at}.")
+        if watcher.last_error:
+            st.caption(f"⚠️ Watcher: {watcher.last_error}")
+    else:
+        linked_watchers().release(watch_session)
+    if linked_version:
+        source = linked_version.path  # the watcher's copy of that version, so it always matches its key
     else:
-        raw = pd.read_excel(file_path, header=None, dtype=str)
-        # Convert raw Excel into a working dataframe
-header_row = 0  # Adjust if your actual headers are not on the first row
-df = pd.read_excel(uploaded if data_mode == "Upload Excel" else file_path, header=header_row)
-df.columns = [str(c).strip() for c in df.columns]
+        # Read the linked file directly: make sure it is complete before parsing it
+        source = resolve_report(file_path)
+        if source is None:
+            st.error(f"❌ No Excel workbook found in: {file_path}")
+            st.stop()
+        try:
+            check_complete(source)
+        except PARTIAL_FILE_ERRORS as exc:
+            wait_for_sync(source, exc)
+
+elif data_mode == "Consolidate Entities":
+    # One workbook per legal entity; each is mapped on its own and tagged with its Entity
+    entity_input = st.radio("🏛️ Entity workbooks from", ["Upload files", "Folder"], horizontal=True)
+    if entity_input == "Upload files":
+        uploads = st.file_uploader(
+            "📂 Upload one AR Excel file per entity", type=["xlsx", "xls"], accept_multiple_files=True
+        )
+        if not uploads:
+            st.info("Upload the entities' AR Excel files to view the consolidated dashboard.")
+            st.stop()
+        entity_sources = dict(zip(entity_names(u.name for u in uploads), (u.getvalue() for u in uploads)))
+        private_data = True
+    else:
+        entity_folder = st.text_input("🗂️ Folder with the entities' workbooks:", "")
+        workbooks = find_workbooks(entity_folder) if entity_folder and os.path.isdir(entity_folder) else []
+        if not workbooks:
+            st.info("Enter a folder containing one AR Excel file per entity.")
+            st.stop()
+        entity_sources = dict(zip(entity_names(workbooks), workbooks))
+    st.caption(f"Consolidating {len(entity_sources)} entities: {', '.join(entity_sources)}")
+    source = None
 
+else:
+    snapshot_dates = snapshot_store.dates()
+    if not snapshot_dates:
+        st.info("No snapshots saved yet. Load a report and use '📦 Save to snapshot history' to start one.")
+        st.stop()
+    history_view = st.radio("🗓️ Snapshot view", ["Single report date", "Aging over time"], horizontal=True)
 
-# ---------------------------------------------------------------
-# 🔍 Remove fully paid invoices (where Due Amount = 0)
-# ---------------------------------------------------------------
-if "Due Amount" in df.columns:
-    df["Due Amount"] = pd.to_numeric(df["Due Amount"], errors="coerce").fillna(0)
-    df = df[df["Due Amount"] > 0]  # ✅ keep only invoices with balance due
+    if history_view == "Aging over time":
+        # Project only the columns needed and push AM/customer filters into the Parquet scan
+        start_date, end_date = st.select_slider(
+            "Report date range", options=snapshot_dates, value=(snapshot_dates[0], snapshot_dates[-1])
+        )
+        # Filter options cover every snapshot in the range, not just the latest one
+        names = snapshot_store.load(start_date, end_date, columns=["Customer Name", "Account Manager"])
+        hist_col1, hist_col2, hist_col3 = st.columns(3)
+        hist_ams = hist_col1.multiselect(
+            "👤 Account Managers", sorted(names["Account Manager"].dropna().unique().tolist())
+        ) if "Account Manager" in names.columns else []
+        hist_custs = hist_col2.multiselect("🏢 Customers", sorted(names["Customer Name"].dropna().unique().tolist()))
+        hist_limits = hist_col3.text_input("Bucket upper limits (days)", ", ".join(map(str, DEFAULT_LIMITS)))
+        try:
+            history_limits = clean_limits(hist_limits.split(","))
+        except ValueError:
+            st.error("❌ Bucket upper limits must be whole numbers separated by commas, e.g. 30, 60, 90.")
+            st.stop()
+
+        history_df = snapshot_store.load(
+            start_date, end_date, columns=["Customer Name", "Account Manager", "Due Date", "Due Amount"],
+            customers=hist_custs, managers=hist_ams,
+        )
+        history = aging_history(history_df, history_limits)
+        st.subheader("📈 Outstanding (Due Amount) by aging bucket over time")
+        st.bar_chart(history.drop(columns="Total"))
+        st.dataframe(history.style.format("₹{:,.0f}"), use_container_width=True)
+        st.stop()
 
+    snapshot_date = st.selectbox("🗓️ Report date", snapshot_dates[::-1], format_func=lambda d: d.strftime("%d %b %Y"))
+    source = None
+
+# Prepared datasets: uploads stay private to the session (keyed by content hash); linked files
+# and snapshots are shared read-only by every session (keyed by path+mtime+size / snapshot version)
+if "workbook_cache" not in st.session_state:
+    st.session_state["workbook_cache"] = WorkbookCache(max_entries=8)
+dataset_cache = st.session_state["workbook_cache"] if private_data else shared_dataset_cache()
+
+streaming_mode = False
+if source is not None:
+    streaming_mode = st.checkbox(
+        "⚡ Streaming reader for very large .xlsx files (reads only the mapped columns, lower peak memory)",
+        value=False,
+    )
+low_memory = st.checkbox(
+    "🪶 Low-memory mode for large invoice sets (drops unmapped columns, stores text as categories / Arrow strings)",
+    value=LOW_MEMORY,
+)
+memory_suffix = ("low_memory",) if low_memory else ()
+
+# Header row + column mapping: from the saved profile of this header layout, or detected on
+# the first rows (and saved). Only the mapped columns are parsed afterwards.
+profile_store = mapping_profiles()
+layout = None
+linked_live = data_mode == "Linked Excel File" and not linked_version  # the file itself, which may change
+if source is not None:
+    try:
+        base_key = linked_version.key if linked_version else source_key(source)
+        layout = dataset_cache.get_or_load(
+            ("layout",) + base_key + (profile_store.revision,), lambda: load_layout(source, profile_store)
+        )
+    except PARTIAL_FILE_ERRORS as exc:
+        if not linked_live:
+            raise
+        wait_for_sync(source, exc)
+    layout_origin = {
+        "detected": "detected automatically",
+        "profile": "saved profile",
+        "confirmed": "confirmed profile",
+    }[layout.origin]
+    with st.expander(f"🧭 Column mapping ({layout_origin})"):
+        st.caption(
+            f"Header on row {layout.header_row + 1}; reading {len(layout.usecols or layout.header)} of "
+            f"{len(layout.header)} columns. Confirm or correct the mapping once and it is reused for every "
+            "workbook with the same header."
+        )
+        map_header_row = int(
+            st.number_input("Header row", min_value=1, value=layout.header_row + 1, step=1,
+                            key=f"map_header_{layout.fingerprint}")
+        ) - 1
+        if map_header_row == layout.header_row:
+            map_header = list(layout.header)
+        else:
+            head = dataset_cache.get_or_load(("sniff",) + base_key, lambda: sniff_workbook(source))
+            map_header = header_at(head, map_header_row)
+        current = {canonical: col for col, canonical in layout.mapping.items()}
+        map_cols = st.columns(3)
+        picks = {}
+        for i, canonical in enumerate(COLUMN_KEYWORDS):
+            options = ["—"] + map_header
+            picks[canonical] = map_cols[i % 3].selectbox(
+                canonical,
+                options,
+                index=options.index(current[canonical]) if current.get(canonical) in options else 0,
+                key=f"map_{layout.fingerprint}_{map_header_row}_{canonical}",
+            )
+        chosen = {col: canonical for canonical, col in picks.items() if col != "—"}
+        btn_col1, btn_col2 = st.columns(2)
+        if btn_col1.button("✅ Save mapping for this layout"):
+            if len(chosen) < sum(col != "—" for col in picks.values()):
+                st.error("❌ Each workbook column can be mapped to one canonical column only.")
+            else:
+                profile_store.save(
+                    make_layout(layout.fingerprint, map_header_row, map_header, chosen, "confirmed"), confirmed=True
+                )
+                st.rerun()
+        if layout.origin != "detected" and btn_col2.button("↩️ Forget saved mapping and detect again"):
+            profile_store.forget(layout.fingerprint)
+            st.rerun()
+
+# Each stage below is memoized across reruns and recomputes only when its own inputs (or an
+# upstream stage) changed:
+# dataset (read + normalize) -> customers -> bucket_index -> age / cube -> filter -> pivot -> format
+if "stage_graph" not in st.session_state:
+    st.session_state["stage_graph"] = StageGraph()
+graph = st.session_state["stage_graph"]
+graph.begin_run(profiler)
+
+read_stats = {}
+if snapshot_date is not None:
+    dataset_key = ("snapshot", snapshot_store.root, snapshot_date, snapshot_store.version(snapshot_date)) + memory_suffix
+    read_dataset = lambda: snapshot_store.load(snapshot_date)
+    log_source = f"snapshot {snapshot_date.isoformat()}"
+elif entity_sources is not None:
+    dataset_key = ("entities", profile_store.revision) + tuple(
+        (entity, source_key(src)) for entity, src in entity_sources.items()
+    ) + memory_suffix
+    read_dataset = None
+    log_source = "entities: " + ", ".join(entity_sources)
+else:
+    dataset_key = workbook_key(base_key, layout, streaming_mode, low_memory)
+    read_dataset = lambda: read_source(
+        source, layout.header_row, streaming=streaming_mode, stats=read_stats, usecols=layout.usecols
+    )
+    # upload name or linked path
+    log_source = linked_version.original if linked_version else getattr(source, "name", None) or os.fspath(source)
 
-# ---------------------------------------------------------------
-# Column mapping
-# ---------------------------------------------------------------
-def match_col(df, keywords):
-    for c in df.columns:
-        if any(k.lower() in c.lower() for k in keywords):
-            return c
-    return None
-
-cust_col = match_col(df, ["customer", "client", "party"])
-am_col = match_col(df, ["account manager", "owner", "manager"])
-inv_amt_col = match_col(df, ["invoice amount", "amount", "invoice_amt"])
-inv_date_col = match_col(df, ["invoice date", "invoice_date", "invoice dt"])
-due_date_col = match_col(df, ["due date", "duedate", "due_dt"])
-paid_amt_col = match_col(df, ["paid amount", "paidamount", "amount paid"])
-due_amt_col = match_col(df, ["due amount", "dueamount", "amount due"])
-status_col = match_col(df, ["payment status", "status", "paid/unpaid"])
-
-mapping = {
-    cust_col: "Customer Name",
-    am_col: "Account Manager",
-    inv_amt_col: "Invoice Amount",
-    inv_date_col: "Invoice Date",
-    due_date_col: "Due Date",
-    paid_amt_col: "Paid Amount",
-    due_amt_col: "Due Amount",
-    status_col: "Payment Status"
-}
-mapping = {k: v for k, v in mapping.items() if k}
-df.rename(columns=mapping, inplace=True)
 
 # ---------------------------------------------------------------
-# Clean & prepare data
+# Column mapping + clean & prepare data (each canonical column is parsed exactly once)
 # ---------------------------------------------------------------
-df["Customer Name"] = df.get("Customer Name", "").astype(str).str.strip()
-df = df[df["Customer Name"] != ""]
-
-# Fix numeric fields
-for c in ["Invoice Amount", "Paid Amount", "Due Amount"]:
-    if c in df.columns:
-        df[c] = (
-            df[c]
-            .astype(str)
-            .str.replace("₹", "", regex=False)
-            .str.replace(",", "", regex=False)
-            .str.strip()
+def load_prepared():
+    """Read and normalize the dataset; only the prepared frame is cached, not the raw one."""
+    if entity_sources is not None:
+        # Workbooks are read in parallel worker processes; returns (df, cleaning report, per-entity summary)
+        with profiler.stage("consolidate") as rec:
+            prepared = consolidate(entity_sources, profile_store, low_memory=low_memory)
+            rec["rows_out"] = len(prepared[0])
+        return prepared
+    with profiler.stage("read") as rec:
+        raw = read_dataset()
+        rec["rows_out"] = len(raw)
+    with profiler.stage("normalize", rows_in=len(raw)) as rec:
+        prepared = prepare_dataset(raw, (layout.mapping or None) if layout else None, low_memory=low_memory)
+        rec["rows_out"] = len(prepared[0])
+    return prepared
+
+
+try:
+    prepared = graph.run(
+        "dataset", lambda: dataset_cache.get_or_load(prepared_key(dataset_key), load_prepared), inputs=dataset_key
+    )
+except ColumnMappingError as exc:
+    st.error(f"❌ {exc}")
+    if read_dataset is not None:
+        # show a short sample to help debugging
+        st.write("Sample header and first 5 rows:")
+        st.write(read_dataset().head(5))
+    st.stop()
+except PARTIAL_FILE_ERRORS as exc:
+    if not linked_live:
+        raise
+    wait_for_sync(source, exc)
+st.session_state["sync_retries"] = 0
+df, normalize_report = prepared[0], prepared[1]
+
+cache_stats = dataset_cache.stats()
+cache_budget = f" of {cache_stats['max_bytes'] / 2**20:,.0f} MB" if cache_stats["max_bytes"] else ""
+st.caption(
+    f"🗂️ {'Session' if private_data else 'Shared'} dataset cache: "
+    f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 2**20:,.1f} MB{cache_budget} · "
+    f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
+if "memory_bytes" in df.attrs:
+    mem_before, mem_after = df.attrs["memory_bytes"]
+    st.caption(
+        f"🪶 Low-memory mode: {mem_after / 2**20:,.2f} MB in memory instead of {mem_before / 2**20:,.2f} MB "
+        f"({mem_before / max(mem_after, 1):.1f}× smaller)"
+    )
+if read_stats:
+    st.caption(
+        f"⚡ Streamed {read_stats['rows']:,} rows ({read_stats['columns_kept']}/{read_stats['columns_total']} columns, "
+        f"header on row {read_stats['header_row'] + 1}): first table in {read_stats['first_chunk_seconds']:.2f}s, "
+        f"total {read_stats['seconds']:.2f}s"
+    )
+
+if entity_sources is not None:
+    entity_summary = prepared[2]
+    failed_entities = entity_summary[entity_summary["Error"] != ""]
+    if len(failed_entities):
+        st.warning(f"⚠️ Skipped {len(failed_entities)} workbook(s): {', '.join(failed_entities['Entity'])}")
+    with st.expander("🏛️ Consolidated entities"):
+        st.dataframe(
+            entity_summary,
+            use_container_width=True,
+            hide_index=True,
+            column_config={"Due Amount": st.column_config.NumberColumn("Due Amount (₹)", step=1)},
         )
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+        st.caption(
+            f"Workbooks are read in parallel: the slowest took {entity_summary['Seconds'].max():.1f}s, "
+            f"{entity_summary['Seconds'].sum():.1f}s if read one after another."
+        )
+
+with st.expander("🧹 Data cleaning report"):
+    st.dataframe(normalize_report, use_container_width=True, hide_index=True)
+    failed_total = int(normalize_report["Failed"].sum())
+    if failed_total:
+        st.caption(f"{failed_total:,} values could not be parsed and were treated as 0 / blank.")
+
+# Spelling variants of one customer ("ABC Pvt Ltd" / "ABC PVT. LTD.") are merged before any
+# aggregation; clustering runs over the distinct names only and is cached per dataset
+customer_matching = st.expander("🔗 Customer name matching")
+with customer_matching:
+    merge_customers = st.toggle(
+        "Merge spelling variants of the same customer (case, punctuation and legal-form spelling only)", value=True
+    )
+    fuzzy_customers = st.checkbox(
+        "Also merge near-identical names (fuzzy; review the merges below before relying on them)",
+        value=False, disabled=not merge_customers,
+    )
+    match_threshold = st.slider(
+        "Similarity needed for near-identical names",
+        min_value=0.8, max_value=0.95, value=FUZZY_THRESHOLD, step=0.05,
+        disabled=not (merge_customers and fuzzy_customers),
+    )
+if not merge_customers:
+    match_threshold = None
+elif not fuzzy_customers:
+    match_threshold = DEFAULT_THRESHOLD
+else:
+    match_threshold = round(match_threshold, 2)
+
+
+def merge_customer_names(prepared):
+    """Prepared frame with canonical customer names, and the clusters used (cached per dataset)."""
+    if match_threshold is None:
+        return prepared[0], None
+    clusters = dataset_cache.get_or_load(
+        clusters_key(dataset_key, match_threshold),
+        lambda: CustomerClusters.from_frame(prepared[0], threshold=match_threshold),
+    )
+    return clusters.apply(prepared[0]), clusters
 
-df["Invoice Date"] = pd.to_datetime(df.get("Invoice Date"), errors="coerce")
-df["Due Date"] = pd.to_datetime(df.get("Due Date"), errors="coerce")
+
+customer_clusters = graph.run("customers", merge_customer_names, inputs=match_threshold, after=("dataset",))[1]
+if customer_clusters is not None:
+    customer_matching.caption(
+        f"{len(customer_clusters.names):,} customer names → {len(customer_clusters.categories):,} customers "
+        f"({customer_clusters.merged:,} spellings merged)."
+    )
+    customer_matching.dataframe(customer_clusters.merges(), use_container_width=True, hide_index=True)
+
+# Keep a columnar copy of this report so it can be reopened (or compared over time) without Excel
+if snapshot_date is None:
+    with st.expander("📦 Save to snapshot history"):
+        source_name = getattr(source, "name", source)
+        save_date = st.date_input(
+            "Report date", value=report_date_from_name(source_name, default=datetime.now().date())
+        )
+        if st.button("💾 Save snapshot"):
+            snapshot_store.write(df, save_date)
+            st.success(f"Saved snapshot for {save_date:%d %b %Y} to {snapshot_store.root}")
 
 # ---------------------------------------------------------------
 # Dynamic Aging Bucket Setup
 # ---------------------------------------------------------------
 with st.expander("⚙️ Aging Bucket Configuration"):
-    col_a, col_b, col_c, col_d = st.columns(4)
-    bucket1 = col_a.number_input("Bucket 1 upper limit (days)", value=30)
-    bucket2 = col_b.number_input("Bucket 2 upper limit (days)", value=60)
-    bucket3 = col_c.number_input("Bucket 3 upper limit (days)", value=90)
-    st.caption("Anything beyond the last limit goes to the '90+ Days' bucket automatically.")
-
-bucket_def = [
-    (f"0–{bucket1} Days", bucket1),
-    (f"{bucket1+1}–{bucket2} Days", bucket2),
-    (f"{bucket2+1}–{bucket3} Days", bucket3)
-]
-
-# ---- Force all bucket limits to float safely ----
-bucket_def = [(label, float(str(limit).strip())) for label, limit in bucket_def]
-
-
-# --- compute and clean "Days Overdue" safely ---
-today = pd.Timestamp(datetime.now().date())
-df["Days Overdue"] = (today - df["Due Date"]).dt.days
-df["Days Overdue"] = (
-    df["Days Overdue"]
-    .astype(str)
-    .str.replace(r"[^0-9\-]", "", regex=True)      # keep digits and minus
-    .replace("", "0")
+    n_buckets = int(st.number_input("Number of buckets", min_value=1, max_value=12, value=len(DEFAULT_LIMITS), step=1))
+    bucket_cols = st.columns(min(n_buckets, 4))
+    raw_limits = [
+        bucket_cols[i % len(bucket_cols)].number_input(
+            f"Bucket {i + 1} upper limit (days)",
+            min_value=0,
+            value=DEFAULT_LIMITS[i] if i < len(DEFAULT_LIMITS) else 30 * (i + 1),
+            step=1,
+            key=f"bucket_limit_{i}",
+        )
+        for i in range(n_buckets)
+    ]
+    show_not_yet_due = st.checkbox("Show a separate 'Not Yet Due' bucket for invoices before their due date", value=True)
+
+    bucket_limits = clean_limits(raw_limits)
+    if bucket_limits != [int(x) for x in raw_limits]:
+        st.warning(f"⚠️ Bucket limits were sorted and de-duplicated to: {', '.join(map(str, bucket_limits))}")
+    st.caption(f"Anything beyond the last limit goes to the '>{bucket_limits[-1]} Days' bucket automatically.")
+
+# Ordered bucket columns
+column_order = bucket_labels(bucket_limits, not_yet_due=show_not_yet_due)
+
+# --- Days Overdue (negative = not yet due) and vectorized bucket assignment ---
+# Snapshots are aged as of their own report date
+today = pd.Timestamp(snapshot_date or datetime.now().date())
+analysis_key = customer_key(dataset_key, match_threshold)
+cube_key = (analysis_key, tuple(bucket_limits), show_not_yet_due, today)
+aged_key, cube_cache_key = aging_keys(analysis_key, bucket_limits, show_not_yet_due, today)
+
+# Invoices sorted once by days overdue per AM/customer, with running totals: any bucket
+# configuration is then answered by binary searches instead of re-aging every invoice
+bucket_index = graph.run(
+    "bucket_index",
+    lambda merged: dataset_cache.get_or_load(
+        bucket_index_key(analysis_key, today), lambda: BucketIndex.build(merged[0], today)
+    ),
+    inputs=today,
+    after=("customers",),
+)
+df = graph.run(
+    "age",
+    lambda merged, index: dataset_cache.get_or_load(
+        aged_key,
+        lambda: age_dataset(merged[0], bucket_limits, not_yet_due=show_not_yet_due, today=today, days=index.days),
+    ),
+    inputs=cube_key,
+    after=("customers", "bucket_index"),
 )
-df["Days Overdue"] = pd.to_numeric(df["Days Overdue"], errors="coerce").fillna(0)
-df["Days Overdue"] = df["Days Overdue"].clip(lower=0).astype(int)
-
-# --- assign aging buckets safely (guaranteed numeric) ---
-def bucket_category(days, buckets):
-    """Return bucket label for given days; fully numeric safe."""
-    try:
-        d = float(str(days).replace(",", "").strip())
-    except Exception:
-        d = 0.0
 
-    for label, limit in buckets:
-        if d <= limit:
-            return label
-    return f">{buckets[-1][1]} Days"
 
-df["Days Overdue"] = df["Days Overdue"].astype(str).str.replace(r"[^0-9\-]", "", regex=True)
-df["Days Overdue"] = pd.to_numeric(df["Days Overdue"], errors="coerce").fillna(0)
-df["Aging Bucket"] = df["Days Overdue"].apply(lambda x: bucket_category(x, bucket_def))
+# Aggregate once per dataset + bucket config; filters and views only slice this cube
+cube = graph.run(
+    "cube",
+    lambda index: dataset_cache.get_or_load(
+        cube_cache_key, lambda: index.cube(bucket_limits, not_yet_due=show_not_yet_due)
+    ),
+    inputs=cube_key,
+    after=("bucket_index",),
+)
 
 
 # ---------------------------------------------------------------
 # Filters
 # ---------------------------------------------------------------
+entity_list = cube.entities()
+selected_entity = "All"
+if entity_list:
+    selected_entity = st.selectbox("🏛️ Filter by Entity", ["All"] + entity_list)
+
 col1, col2, col3 = st.columns(3)
+selected_am = "All"
 if "Account Manager" in df.columns:
-    am_list = sorted(df["Account Manager"].dropna().unique().tolist())
+    am_list = cube.slice(entity=selected_entity).managers()
     selected_am = col1.selectbox("👤 Filter by Account Manager", ["All"] + am_list)
-    if selected_am != "All":
-        df = df[df["Account Manager"] == selected_am]
-
-cust_list = sorted(df["Customer Name"].dropna().unique().tolist())
+cust_list = cube.slice(manager=selected_am, entity=selected_entity).customers()
 selected_cust = col2.selectbox("🏢 Filter by Customer", ["All"] + cust_list)
-if selected_cust != "All":
-    df = df[df["Customer Name"] == selected_cust]
 
-view_mode = col3.radio("📊 View Mode", ["Customer-wise", "Account Manager Summary"], horizontal=True)
-
-# -------------------- Robust pivot + display (force Customer Name) --------------------
-# Ensure a Customer Name column exists (robust heuristics)
-if "Customer Name" in df.columns and df["Customer Name"].notna().any():
-    df["Customer Name"] = df["Customer Name"].astype(str).str.strip()
-else:
-    candidate = None
-    keys = ["customer name", "customer", "client", "party", "cust name", "party name"]
-    for c in df.columns:
-        low = str(c).strip().lower()
-        if any(k in low for k in keys):
-            candidate = c
-            break
-    if not candidate:
-        # fallback: first non-numeric non-date column
-        for c in df.columns:
-            low = str(c).strip().lower()
-            if any(k in low for k in ["date", "amount", "invoice", "due", "paid", "status", "terms", "no"]):
-                continue
-            sample = df[c].dropna().astype(str).head(20).tolist()
-            if sample and any(not s.strip().replace(",", "").replace("₹", "").replace(".", "").isdigit() for s in sample):
-                candidate = c
-                break
-    if candidate:
-        df["Customer Name"] = df[candidate].astype(str).str.strip()
-    else:
-        # last resort: first non-empty column
-        for c in df.columns:
-            if df[c].dropna().astype(str).str.strip().astype(bool).any():
-                df["Customer Name"] = df[c].astype(str).str.strip()
-                candidate = c
-                break
-
-# If still missing or all blank, stop with diagnostic
-if "Customer Name" not in df.columns or df["Customer Name"].dropna().astype(str).str.strip().eq("").all():
-    st.error("❌ Could not detect any Customer Name values. Detected columns: " + ", ".join(map(str, df.columns.tolist())))
-    # show a short sample to help debugging
-    st.write("Sample header and first 5 rows:")
-    st.write(df.head(5))
-    st.stop()
-
-# Ensure Invoice Amount numeric and Days Overdue numeric
-df["Invoice Amount"] = df.get("Invoice Amount", 0).astype(str).str.replace("₹","", regex=False).str.replace(",","", regex=False).str.strip()
-df["Invoice Amount"] = pd.to_numeric(df["Invoice Amount"], errors="coerce").fillna(0)
-
-today = pd.Timestamp(datetime.now().date())
-df["Days Overdue"] = (today - pd.to_datetime(df.get("Due Date"), errors="coerce")).dt.days
-df["Days Overdue"] = pd.to_numeric(df["Days Overdue"], errors="coerce").fillna(0).clip(lower=0).astype(int)
-
-# Recompute Aging Bucket based on your bucket_def (ensure bucket_def exists and is numeric)
-# Force bucket_def limits to numeric if they exist
-try:
-    bucket_def = [(lbl, float(limit)) for lbl, limit in bucket_def]
-except Exception:
-    # fallback default buckets
-    bucket_def = [("0–30 Days", 30.0), ("31–60 Days", 60.0), ("61–90 Days", 90.0)]
-
-def bucket_category_safe(days, buckets):
-    try:
-        d = float(days)
-    except Exception:
-        d = 0.0
-    for label, lim in buckets:
-        if d <= lim:
-            return label
-    return f">{int(buckets[-1][1])} Days"
-
-df["Aging Bucket"] = df["Days Overdue"].apply(lambda x: bucket_category_safe(x, bucket_def))
-
-# Build pivot safely
-index_col = "Customer Name" if view_mode == "Customer-wise" else "Account Manager"
-if index_col not in df.columns:
-    # If AM view but Account Manager missing, fall back to Customer Name
-    if index_col == "Account Manager" and "Customer Name" in df.columns:
-        index_col = "Customer Name"
-    else:
-        st.error(f"❌ Required index column '{index_col}' not found in data.")
-        st.write("Detected columns:", df.columns.tolist())
-        st.stop()
-
-pivot = df.pivot_table(index=index_col, columns="Aging Bucket", values="Invoice Amount", aggfunc="sum", fill_value=0)
-
-# Build column order from bucket_def
-column_order = [b[0] for b in bucket_def] + [f">{int(bucket_def[-1][1])} Days"]
-pivot = pivot.reindex(columns=column_order, fill_value=0)
-
-# Add Grand Total row (only if not already present)
-if "Grand Total" not in pivot.index:
-    subtotal = pd.DataFrame(pivot.sum()).T
-    subtotal.index = ["Grand Total"]
-    pivot = pd.concat([pivot, subtotal])
-
-# ensure numeric & compute totals
-pivot = pivot.apply(pd.to_numeric, errors="coerce").fillna(0)
-pivot["Total"] = pivot[column_order].sum(axis=1)
-
-# Reset index -> Customer Name becomes a column
-display_df = pivot.reset_index()
-
-# Add S.No (1..N)
-display_df.insert(0, "S.No", range(1, len(display_df) + 1))
+# Filters pick row positions in the aged invoices (None = all of them); rows are copied only for an export
+filtered_rows, cube = graph.run(
+    "filter",
+    lambda aged, full_cube: (
+        filter_rows(aged, manager=selected_am, customer=selected_cust, entity=selected_entity),
+        full_cube.slice(manager=selected_am, customer=selected_cust, entity=selected_entity),
+    ),
+    inputs=(selected_am, selected_cust, selected_entity),
+    after=("age", "cube"),
+)
 
-# Format currency for display
-for col in column_order + ["Total"]:
-    if col in display_df.columns:
-        display_df[col] = display_df[col].apply(lambda x: f"₹{x:,.0f}" if pd.notnull(x) else "-")
+view_modes = ["Customer-wise", "Account Manager Summary"] + (["Entity Summary"] if entity_list else [])
+view_mode = col3.radio("📊 View Mode", view_modes, horizontal=True)
 
-# Define highlight function (safe)
-def highlight_overdue_safe(row):
-    overdue_col = f">{int(bucket_def[-1][1])} Days"
-    overdue_val = 0.0
-    if overdue_col in row.index:
-        try:
-            overdue_val = float(str(row[overdue_col]).replace("₹","").replace(",","").strip())
-        except Exception:
-            overdue_val = 0.0
-    key_value = ""
-    for key in [index_col, "Customer Name", "Account Manager"]:
-        if key in row.index:
-            key_value = str(row[key])
-            break
-    color = "background-color: #ffe6e6;" if (overdue_val > 0 and key_value != "Grand Total") else ""
-    return [color] * len(row)
+# Build pivot from the cube (Grand Total row and Total column included)
+index_col = pivot_index(df, view_mode)
+pivot = graph.run("pivot", lambda filtered: filtered[1].pivot(index_col), inputs=index_col, after=("filter",))
+display_df = graph.run("format", pivot_display, after=("pivot",))
 
 # Display
-if display_df.empty:
+if cube.empty:
     st.warning("⚠️ No data to show after filtering.")
 else:
     st.subheader(f"📅 {view_mode} Aging Buckets")
-    st.dataframe(display_df, use_container_width=True, hide_index=True)
+    # Numbers stay numeric (sortable); ₹ grouping and the overdue bar are applied by the grid
+    st.dataframe(
+        display_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "S.No": st.column_config.NumberColumn("S.No", format="%d"),
+            **money_columns(pivot.columns),
+            OVERDUE_SHARE: st.column_config.ProgressColumn(
+                OVERDUE_SHARE,
+                help=f"'{column_order[-1]}' as a share of the row Total",
+                format="%.0f%%",
+                min_value=0,
+                max_value=100,
+            ),
+        },
+    )
+
+# Charts from the cube and the bucket index: top-N folding and due-date binning happen here,
+# so each figure holds a bounded number of bars/points however many invoices there are
+if not cube.empty:
+    st.subheader("📊 Aging charts")
+    chart_col1, chart_col2, chart_col3 = st.columns(3)
+    chart_top = chart_col1.slider("Top N", 5, 50, DEFAULT_TOP, help="Smaller rows are summed into 'Others'")
+    chart_value = chart_col2.selectbox("Chart amount", ["Due Amount", "Invoice Amount", "Paid Amount"])
+    chart_freq = chart_col3.selectbox("Due-date bins", ["Auto"] + list(FREQUENCIES))
+    stack_dims = (["Entity"] if entity_list else []) + (
+        ["Account Manager"] if "Account Manager" in df.columns else []
+    )
+    chart_tables, timeline = graph.run(
+        "charts",
+        lambda filtered, index: (
+            {dim: top_n_buckets(filtered[1], dim, chart_top, chart_value) for dim in stack_dims + ["Customer Name"]},
+            due_date_timeline(
+                index,
+                today,
+                groups=index.group_mask(manager=selected_am, customer=selected_cust, entity=selected_entity),
+                value=chart_value,
+                freq=FREQUENCIES.get(chart_freq),
+            ),
+        ),
+        inputs=(chart_top, chart_value, chart_freq),
+        after=("filter", "bucket_index"),
+    )
+    chart_tabs = st.tabs([f"By {dim}" for dim in stack_dims] + [f"Top {chart_top} customers", "Due-date timeline"])
+    for tab, dim in zip(chart_tabs, stack_dims):
+        tab.plotly_chart(stacked_bucket_figure(chart_tables[dim], cube.buckets, chart_value), use_container_width=True)
+    chart_tabs[-2].plotly_chart(
+        stacked_bucket_figure(chart_tables["Customer Name"], cube.buckets, chart_value, horizontal=True),
+        use_container_width=True,
+    )
+    chart_tabs[-1].plotly_chart(timeline_figure(timeline, today, chart_value), use_container_width=True)
+
+# What-if: several bucket configurations side by side, for the current filters
+with st.expander("🧪 Compare bucket configurations"):
+    cmp_col1, cmp_col2 = st.columns([3, 1])
+    config_text = cmp_col1.text_area(
+        "Bucket upper limits, one configuration per line",
+        "\n".join([", ".join(map(str, bucket_limits)), "15, 30, 45, 60", "30, 60, 90, 180", "7, 14, 21, 28"]),
+    )
+    compare_value = cmp_col2.selectbox("Amount", ["Due Amount", "Invoice Amount", "Paid Amount"])
+    configs = []
+    for line in config_text.splitlines():
+        try:
+            configs.append(clean_limits(line.split(",")))
+        except ValueError:
+            if line.strip():
+                st.warning(f"⚠️ Skipped '{line.strip()}': enter whole numbers separated by commas.")
+    comparison = compare_configurations(
+        bucket_index,
+        configs,
+        not_yet_due=show_not_yet_due,
+        groups=bucket_index.group_mask(manager=selected_am, customer=selected_cust, entity=selected_entity),
+        value=compare_value,
+    )
+    for start in range(0, len(configs), 4):
+        for cmp_col, limits in zip(st.columns(4), configs[start:start + 4]):
+            cmp_col.markdown(f"**{config_label(limits)}**")
+            cmp_col.dataframe(
+                comparison[comparison["Configuration"] == config_label(limits)].drop(columns="Configuration"),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    compare_value: st.column_config.NumberColumn(f"{compare_value} (₹)", step=1),
+                    "Share %": st.column_config.ProgressColumn("Share %", format="%.0f%%", min_value=0, max_value=100),
+                },
+            )
+
 
-    
 # ---------------------------------------------------------------
 # 🔍 Invoice-level details (on Customer click)
 # ---------------------------------------------------------------
 
 st.markdown("### 🔍 Invoice-wise Details")
 
-# Dropdown or clickable customer selection
-customers = sorted(df["Customer Name"].dropna().unique().tolist())
+# Invoice number / customer / amount lookup: sorted keys, a customer-name token index and sorted
+# amounts, built once per dataset (shared like the bucket index); a lookup is a few binary searches
+search_index = graph.run(
+    "search_index",
+    lambda merged: dataset_cache.get_or_load(("search",) + analysis_key, lambda: InvoiceSearch.build(merged[0])),
+    inputs=analysis_key,
+    after=("customers",),
+)
+find_col1, find_col2, find_col3 = st.columns([3, 1, 1])
+find_text = find_col1.text_input(
+    "🔎 Find invoices by invoice number or customer name", "", placeholder="e.g. INV/00148, 148, ganga tex"
+)
+find_low = find_col2.number_input("Due Amount from (₹)", min_value=0.0, value=None, step=1000.0)
+find_high = find_col3.number_input("Due Amount to (₹)", min_value=0.0, value=None, step=1000.0)
+
+found_rows = None  # positions of the filtered invoices that match, when a lookup is active
+if find_text.strip() or find_low is not None or find_high is not None:
+    find_start = time.perf_counter()
+    found_rows = search_index.locate(search_index.find(find_text, find_low, find_high), df)
+    if filtered_rows is not None:
+        found_rows = np.intersect1d(found_rows, filtered_rows, assume_unique=True)
+    find_ms = (time.perf_counter() - find_start) * 1000
+    customers = sorted(df["Customer Name"].iloc[found_rows].dropna().unique().tolist())
+    st.caption(
+        f"{len(found_rows):,} matching invoices of {len(customers):,} customers, "
+        f"₹{df['Due Amount'].to_numpy()[found_rows].sum():,.2f} due ({find_ms:.2f} ms). "
+        "Pick a customer below to see its matching invoices."
+    )
+else:
+    customers = cube.customers()
+
+# Dropdown or clickable customer selection (only customers with matches while searching)
 selected_customer = st.selectbox(
     "Select Customer to view invoice details:",
-    sorted(df["Customer Name"].unique())
+    customers
 )
 
-if selected_customer:
-    filtered_df = df[df["Customer Name"] == selected_customer].copy()
-
-    # Convert numeric columns safely
-    for col in ["Invoice Amount", "Paid Amount", "Due Amount"]:
-        filtered_df[col] = pd.to_numeric(filtered_df[col], errors="coerce").fillna(0)
+# Row positions of every customer's invoices, built once per aged dataset and narrowed to the
+# filtered rows per customer. Filtering, sorting and paging run here on the server; only the
+# visible page is sent to the grid.
+customer_index = graph.run("customer_index", customer_rows, after=("age",))
+shown_rows = filtered_rows if found_rows is None else found_rows  # None = every invoice
 
-    # ✅ Calculate totals
-    total_invoice = filtered_df["Invoice Amount"].sum()
-    total_paid = filtered_df["Paid Amount"].sum()
-    total_due = filtered_df["Due Amount"].sum()
+if selected_customer:
+    # ✅ Calculate totals (from the cube, no row scan)
+    customer_totals = cube.slice(customer=selected_customer).totals()
+    total_invoice = customer_totals["Invoice Amount"]
+    total_paid = customer_totals["Paid Amount"]
+    total_due = customer_totals["Due Amount"]
 
     # Display subtotals neatly
     st.markdown(f"""
@@ -522,71 +923,96 @@ if selected_customer:
     <hr style='border:1px solid #ccc; margin:10px 0;'>
     """, unsafe_allow_html=True)
 
-    # ✅ Show invoice detail table
-    gb = GridOptionsBuilder.from_dataframe(filtered_df)
-    gb.configure_pagination(enabled=True)
-    gb.configure_default_column(resizable=True, sortable=True, filter=True)
-    gridOptions = gb.build()
-
-    AgGrid(filtered_df, gridOptions=gridOptions, theme="balham", height=400)
+    detail_columns = [c for c in DETAIL_COLUMNS if c in df.columns]
+    det_col1, det_col2, det_col3, det_col4, det_col5 = st.columns([2, 1, 3, 2, 1])
+    sort_by = det_col1.selectbox(
+        "Sort by", detail_columns, index=detail_columns.index("Due Date") if "Due Date" in detail_columns else 0
+    )
+    sort_descending = det_col2.toggle("Descending", value=False)
+    bucket_filter = det_col3.multiselect("Aging buckets", column_order)
+    invoice_search = det_col4.text_input("Invoice No. contains", "")
+    page_size = det_col5.selectbox("Rows / page", PAGE_SIZES, index=1)
+
+    view_rows = graph.run(
+        "detail",
+        lambda filtered, index: select_rows(
+            df,
+            index.get(selected_customer) if shown_rows is None else np.intersect1d(
+                index.get(selected_customer, shown_rows[:0]), shown_rows, assume_unique=True
+            ),
+            sort_by=sort_by, ascending=not sort_descending, buckets=bucket_filter, search=invoice_search,
+        ),
+        inputs=(selected_customer, sort_by, sort_descending, tuple(bucket_filter), invoice_search,
+                find_text.strip(), find_low, find_high),
+        after=("filter", "customer_index"),
+    )
+    n_pages = page_count(len(view_rows), page_size)
+    page_no = int(st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1, step=1))
+    page_df = page_frame(df, view_rows, page_no, page_size, columns=detail_columns).copy()
 
+    # ✅ Show invoice detail table (one page; sorting/filtering is done above, server-side)
+    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode  # deferred: only needed once a grid is shown
 
-    # Ensure numeric formatting
+    gb = GridOptionsBuilder.from_dataframe(page_df)
+    gb.configure_default_column(resizable=True, sortable=False, filter=False)
     for col in ["Invoice Amount", "Paid Amount", "Due Amount"]:
-        if col in filtered_df.columns:
-            filtered_df[col] = (
-                pd.to_numeric(filtered_df[col], errors="coerce")
-                .fillna(0)
-                .apply(lambda x: f"₹{x:,.2f}")
-            )
+        if col in page_df.columns:
+            gb.configure_column(col, type=["numericColumn"], valueFormatter=JsCode(INR_FORMATTER))
+    for col in ["Invoice Date", "Due Date"]:
+        if col in page_df.columns:
+            gb.configure_column(col, valueFormatter=JsCode(DATE_FORMATTER))
+    gridOptions = gb.build()
 
-    # Display nicely
-    st.dataframe(
-        filtered_df[
-            [
-                c
-                for c in [
-                    "Invoice No.",
-                    "Invoice Date",
-                    "Due Date",
-                    "Invoice Amount",
-                    "Paid Amount",
-                    "Due Amount",
-                    "Delay Days",
-                ]
-                if c in filtered_df.columns
-            ]
-        ],
-        use_container_width=True,
-        hide_index=True,
-    )
+    with profiler.stage("grid", rows_in=len(view_rows)) as rec:
+        AgGrid(page_df, gridOptions=gridOptions, theme="balham", height=400, allow_unsafe_jscode=True)
+        rec["rows_out"] = len(page_df)
 
-    # Optional: subtotal at the bottom
-    total_due = pd.to_numeric(
-        filtered_df["Due Amount"].replace("₹", "", regex=True).replace(",", "", regex=True),
-        errors="coerce",
-    ).sum()
+    first_row = (page_no - 1) * page_size
+    st.caption(
+        f"Showing {first_row + 1 if len(page_df) else 0:,}–{first_row + len(page_df):,} "
+        f"of {len(view_rows):,} matching invoices"
+    )
 
     st.markdown(f"**Total Outstanding for {selected_customer}: ₹{total_due:,.2f}**")
 
-# Download filtered/pivot as Excel (keeps Customer/AM column)
-buf = io.BytesIO()
-with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-    pivot.to_excel(writer, sheet_name="Aging_Pivot")
-    df.to_excel(writer, sheet_name="Raw_Filtered_Data", index=False)
-buf.seek(0)
-st.download_button("⬇️ Download Filtered Report (Excel)", data=buf, file_name="Aging_Report_Filtered.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
-# KPIs (safe numeric)
-total = df["Invoice Amount"].sum()
-paid = df.get("Paid Amount", 0)
-if isinstance(paid, (pd.Series, pd.Index)):
-    paid = pd.to_numeric(paid.astype(str).str.replace("₹","").str.replace(",",""), errors="coerce").fillna(0).sum()
-else:
-    try:
-        paid = float(str(paid).replace("₹","").replace(",",""))
-    except Exception:
-        paid = 0.0
+# ---------------------------------------------------------------
+# ⬇️ Export (built only on request, cached per filter state)
+# ---------------------------------------------------------------
+if "export_cache" not in st.session_state:
+    st.session_state["export_cache"] = WorkbookCache(max_entries=4)
+export_cache = st.session_state["export_cache"]
+
+st.markdown("### ⬇️ Download Filtered Report")
+exp_col1, exp_col2, exp_col3 = st.columns([2, 2, 1])
+export_format = exp_col1.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+export_table = exp_col2.radio(
+    "Table", EXPORT_TABLES, horizontal=True, disabled=export_format == "Excel (.xlsx)",
+    help="Excel exports always contain both the aging pivot and the filtered invoices.",
+)
+export_state = (cube_key, selected_entity, selected_am, selected_cust, view_mode, export_format,
+                None if export_format == "Excel (.xlsx)" else export_table)
+
+if exp_col3.button("Prepare export") or export_state in export_cache:
+    with profiler.stage("export", rows_in=len(df) if filtered_rows is None else len(filtered_rows)) as rec:
+        rec["cached"] = export_state in export_cache
+        export_bytes = export_cache.get_or_load(
+            export_state,
+            lambda: export_report(
+                export_format, pivot, df if filtered_rows is None else df.take(filtered_rows), table=export_table
+            ),
+        )
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        f"⬇️ Download Aging_Report_Filtered{extension}",
+        data=export_bytes,
+        file_name=f"Aging_Report_Filtered{extension}",
+        mime=mime,
+    )
+
+# KPIs from the filtered cube
+cube_totals = cube.totals()
+total = cube_totals["Invoice Amount"]
+paid = cube_totals["Paid Amount"]
 unpaid = total - paid
 paid_ratio = (paid / total * 100) if total else 0.0
 
@@ -595,3 +1021,41 @@ c1.metric("Total Receivable", f"₹{total:,.2f}")
 c2.metric("Paid", f"₹{paid:,.2f}")
 c3.metric("Unpaid", f"₹{unpaid:,.2f}")
 c4.metric("Paid Ratio", f"{paid_ratio:.1f}%")
+
+# ---------------------------------------------------------------
+# 🩺 Diagnostics panel + structured log (one JSON line per rerun)
+# ---------------------------------------------------------------
+if profiler.enabled:
+    stage_df = profiler.to_frame()
+    with st.sidebar:
+        st.markdown(f"**This rerun: {profiler.total_seconds:.2f}s**")
+        st.dataframe(
+            stage_df,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "seconds": st.column_config.NumberColumn("Seconds", format="%.3f"),
+                "rss_delta_mb": st.column_config.NumberColumn("Δ RSS (MB)", format="%.1f"),
+                "rss_mb": st.column_config.NumberColumn("RSS (MB)", format="%.1f"),
+                "alloc_peak_mb": st.column_config.NumberColumn("Alloc peak (MB)", format="%.1f"),
+            },
+        )
+        if warmup_status is not None:
+            if not warmup_status.get("done"):
+                st.caption(f"⏳ Warm-up running since {warmup_status['started']:%H:%M:%S}")
+            elif "error" in warmup_status:
+                st.caption(f"⚠️ Warm-up: {warmup_status['error']}")
+            else:
+                imports = ", ".join(
+                    f"{name} {seconds:.2f}s" for name, seconds in warmup_status["imports"].items() if seconds is not None
+                )
+                st.caption(
+                    f"🔥 Warm-up {warmup_status['total']:.2f}s — imports: {imports}; "
+                    f"layout {warmup_status['layout']:.2f}s, report {warmup_status['preload']:.2f}s"
+                )
+        try:
+            profiler.write_log(DEFAULT_LOG, source=log_source, view=view_mode,
+                               manager=selected_am, customer=selected_cust)
+            st.caption(f"Appended to {DEFAULT_LOG}")
+        except OSError as exc:
+            st.caption(f"⚠️ Could not write diagnostics log: {exc}")
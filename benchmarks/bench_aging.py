@@ -0,0 +1,66 @@
+"""Benchmark the vectorized aging engine against the old per-row ``apply`` path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_aging --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ar_core.aging import age_days, bucket_labels
+
+
+def bucket_category_safe(days, buckets):
+    """Per-invoice bucketing as previously done in ``ar_dashboard.py``."""
+    try:
+        d = float(days)
+    except Exception:
+        d = 0.0
+    for label, lim in buckets:
+        if d <= lim:
+            return label
+    return f">{int(buckets[-1][1])} Days"
+
+
+def legacy_aging(days, limits):
+    labels = bucket_labels(limits, not_yet_due=False)
+    bucket_def = [(label, float(limit)) for label, limit in zip(labels[:-1], limits)]
+    return days.apply(lambda x: bucket_category_safe(x, bucket_def))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limits", default="30,60,90", help="comma-separated bucket upper limits")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    limits = [int(x) for x in args.limits.split(",")]
+    rng = np.random.default_rng(42)
+    days = pd.Series(rng.integers(0, 400, args.rows))
+
+    legacy_s, legacy = best_of(lambda: legacy_aging(days, limits), 1)
+    vector_s, vector = best_of(lambda: age_days(days, limits, not_yet_due=False), args.repeat)
+
+    if not (pd.Series(vector, dtype=object) == legacy).all():
+        raise SystemExit("Vectorized buckets differ from the legacy path.")
+
+    print(f"rows={args.rows:,} buckets={len(limits) + 1}")
+    print(f"legacy apply : {legacy_s * 1000:10.1f} ms")
+    print(f"vectorized   : {vector_s * 1000:10.1f} ms  ({legacy_s / vector_s:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare the standard ``pd.read_excel`` path with the streaming read-only reader.
+
+Reports wall time, time to first table chunk and peak memory (Python heap via
+tracemalloc plus Arrow's allocator) for each reader. Run from the repository root:
+
+    python -m benchmarks.bench_ingest "08 Nov 2025 AR Report Final.xlsx"
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from ar_core.ingest import read_workbook, read_workbook_streaming
+
+
+def measure(reader, path):
+    """Time an untraced run, then repeat it under tracemalloc for the peak-memory figure."""
+    import pyarrow as pa
+
+    gc.collect()
+    stats = {}
+    start = time.perf_counter()
+    df = reader(path, stats)
+    seconds = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+    del df
+
+    gc.collect()
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    reader(path, {})
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": stats.get("rows"),
+        "columns": stats.get("columns"),
+        "seconds": seconds,
+        "first_table_seconds": stats.get("first_chunk_seconds", seconds),
+        "peak_mb": (python_peak + max(0, pa.total_allocated_bytes() - arrow_before)) / 2**20,
+        "frame_mb": frame_mb,
+    }
+
+
+def _standard(path, stats):
+    df = read_workbook(path)
+    stats.update(rows=len(df), columns=df.shape[1])
+    return df
+
+
+def _streaming(path, stats):
+    df = read_workbook_streaming(path, stats=stats)
+    stats.update(columns=df.shape[1])
+    return df
+
+
+READERS = {"read_excel": _standard, "streaming": _streaming}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workbook", help=".xlsx file to read")
+    args = parser.parse_args(argv)
+
+    print(f"{'reader':<12}{'rows':>10}{'cols':>6}{'total s':>10}{'first s':>10}{'peak MB':>10}{'frame MB':>10}")
+    for name, reader in READERS.items():
+        r = measure(reader, args.workbook)
+        print(f"{name:<12}{r['rows']:>10,}{r['columns']:>6}{r['seconds']:>10.2f}"
+              f"{r['first_table_seconds']:>10.2f}{r['peak_mb']:>10.1f}{r['frame_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Pipeline benchmark suite over synthetic AR datasets.
+
+Times each stage (read, normalize, age, pivot, format, export) at several dataset sizes,
+records peak memory and writes machine-readable results. Run from the repository root:
+
+    python -m benchmarks.run_suite --sizes 10000,100000,1000000 --output bench_results.json
+    python -m benchmarks.run_suite --compare bench_results.json --output new_results.json
+
+With ``--compare`` the run exits non-zero when any stage is slower than the baseline by
+more than ``--threshold``, so it can gate a deployment.
+
+Excel cannot hold more than 1,048,576 rows per sheet, and writing/reading very large
+workbooks dominates the run time; sizes above ``--excel-max-rows`` skip the Excel read and
+Excel export stages and feed the generated frame straight into normalization.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ar_core import AgingCube, age_dataset, bucket_labels, pivot_display, prepare_dataset, read_workbook
+from ar_core.aging import DEFAULT_LIMITS
+from ar_core.export import export_excel, export_parquet
+from benchmarks.synthetic import EXCEL_MAX_ROWS, generate_raw, write_workbook
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def peak_rss_mb():
+    """Process memory high-water mark in MB (None where ``resource`` is unavailable, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def run_stage(records, size, stage, fn, rows_in, trace_memory):
+    """Time ``fn()`` and append a result record; with ``trace_memory`` repeat it under tracemalloc."""
+    gc.collect()
+    start = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - start
+    head = out[0] if isinstance(out, tuple) else out
+    record = {
+        "rows": size,
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "rows_in": rows_in,
+        "rows_out": None if isinstance(head, bytes) else len(head),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if isinstance(head, bytes):
+        record["output_bytes"] = len(head)
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        record["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    records.append(record)
+    print(f"{size:>10,}  {stage:<14}{seconds:>9.3f}s  rss={record['peak_rss_mb']} MB", flush=True)
+    return out
+
+
+def run_size(size, seed, limits, workdir, excel_max_rows, trace_memory):
+    records = []
+    raw = generate_raw(size, seed=seed)
+    use_excel = size <= min(excel_max_rows, EXCEL_MAX_ROWS - 1)
+
+    if use_excel:
+        path = write_workbook(raw, os.path.join(workdir, f"synthetic_{size}.xlsx"))
+        raw = run_stage(records, size, "read", lambda: read_workbook(path), size, trace_memory)
+    else:
+        records.append({"rows": size, "stage": "read", "skipped": "above --excel-max-rows"})
+
+    df, _ = run_stage(records, size, "normalize", lambda: prepare_dataset(raw), len(raw), trace_memory)
+    aged = run_stage(records, size, "age", lambda: age_dataset(df, limits, today="2025-11-08"), len(df), trace_memory)
+    labels = bucket_labels(limits)
+
+    def pivot_stage():
+        cube = AgingCube.build(aged, labels)
+        return cube.pivot("Customer Name"), cube.pivot("Account Manager")
+
+    pivot, _ = run_stage(records, size, "pivot", pivot_stage, len(aged), trace_memory)
+    run_stage(records, size, "format", lambda: pivot_display(pivot), len(pivot), trace_memory)
+    if use_excel:
+        run_stage(records, size, "export_xlsx",
+                  lambda: export_excel({"Aging_Pivot": pivot, "Raw_Filtered_Data": aged}), len(aged), trace_memory)
+    run_stage(records, size, "export_parquet", lambda: export_parquet(aged), len(aged), trace_memory)
+    return records
+
+
+def compare(results, baseline, threshold):
+    """Stages slower than ``threshold`` × baseline (ignoring sub-noise-floor timings)."""
+    old = {(r["rows"], r["stage"]): r["seconds"] for r in baseline["results"] if "seconds" in r}
+    regressions = []
+    for r in results:
+        before = old.get((r["rows"], r["stage"]))
+        if before is None or "seconds" not in r or max(before, r["seconds"]) < NOISE_FLOOR_SECONDS:
+            continue
+        ratio = r["seconds"] / before if before else float("inf")
+        if ratio > threshold:
+            regressions.append({"rows": r["rows"], "stage": r["stage"], "before": before,
+                                "after": r["seconds"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def environment():
+    import pyarrow
+
+    return {
+        "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AR pipeline stage by stage.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated invoice counts (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--buckets", default=",".join(map(str, DEFAULT_LIMITS)))
+    parser.add_argument("--excel-max-rows", type=int, default=200_000,
+                        help="largest size that goes through a real .xlsx read/export (default: %(default)s)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="re-run each stage under tracemalloc to record its own peak allocation")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    limits = [int(x) for x in args.buckets.split(",") if x.strip()]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ar_bench_") as workdir:
+        for size in sizes:
+            results.extend(run_size(size, args.seed, limits, workdir, args.excel_max_rows, args.trace_memory))
+
+    payload = {"environment": environment(), "config": vars(args), "results": results}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            payload["regressions"] = compare(results, json.load(fh), args.threshold)
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    for r in payload.get("regressions", []):
+        print(f"REGRESSION {r['rows']:,} rows / {r['stage']}: {r['before']:.3f}s -> {r['after']:.3f}s "
+              f"({r['ratio']}x)", file=sys.stderr)
+    return 1 if payload.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Deterministic generator of realistic (messy) AR workbooks for benchmarks.
+
+The generated frame looks like what ``pd.read_excel`` returns for our month-end reports:
+header names that vary between exports (exercising ``match_col``), ₹/comma-formatted
+amounts mixed with plain numbers, blank rows, fully paid (zero-due) invoices, missing due
+dates, customer-name spelling variants and skewed customer / account-manager volumes.
+
+    python -m benchmarks.synthetic 100000 synthetic_100k.xlsx --seed 7
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1_048_576
+
+# Header spellings seen across entities' exports; all resolve through ar_core.columns.match_col
+HEADER_VARIANTS = {
+    "Invoice No.": ["Invoice No.", "Invoice Number", "Inv No"],
+    "Customer Name": ["Customer Name", "Client Name", "Party Name", " Customer "],
+    "Account Manager": ["Account Manager", "Owner", "Relationship Manager"],
+    "Invoice Date": ["Invoice Date", "Invoice_Date", "Invoice Dt"],
+    "Due Date": ["Due Date", "DueDate", "Due_Dt"],
+    "Invoice Amount": ["Invoice Amount", "Invoice_Amt"],
+    "Paid Amount": ["Paid Amount", "Amount Paid", "PaidAmount"],
+    "Due Amount": ["Due Amount", "Amount Due", "DueAmount"],
+    "Payment Status": ["Payment Status", "Status", "Paid/Unpaid"],
+}
+
+_NAME_WORDS = ["Shree", "Global", "Sai", "Bharat", "Apex", "Sun", "Metro", "Vista", "Prime", "Orion",
+               "Nova", "Indus", "Ganga", "Delta", "Zenith", "Lotus", "Tata", "Vardhman", "Kaveri", "Unity"]
+_NAME_KINDS = ["Traders", "Infotech", "Pharma", "Logistics", "Textiles", "Foods", "Motors", "Exports",
+               "Systems", "Builders", "Retail", "Chemicals"]
+_SUFFIXES = ["Pvt Ltd", "Private Limited", "Ltd", "LLP", "& Co"]
+_SUFFIX_VARIANTS = {"Pvt Ltd": ["PVT. LTD.", "Pvt. Ltd", "Private Limited"], "Ltd": ["Limited", "LTD."],
+                    "Private Limited": ["Pvt Ltd"], "LLP": ["L.L.P."], "& Co": ["and Co", "& Co."]}
+_MANAGERS = ["Asha Rao", "Ravi Kumar", "Meena Iyer", "Karan Shah", "Neha Gupta", "Vikram Singh",
+             "Pooja Nair", "Arjun Mehta", "Divya Menon", "Sanjay Das", "Farah Khan", "Rohit Jain"]
+
+
+def _customer_names(n_customers, rng):
+    words = rng.choice(_NAME_WORDS, size=(n_customers, 2))
+    kinds = rng.choice(_NAME_KINDS, size=n_customers)
+    suffixes = rng.choice(_SUFFIXES, size=n_customers)
+    return [f"{a} {b} {k} {s}" if a != b else f"{a} {k} {s}" for (a, b), k, s in zip(words, kinds, suffixes)]
+
+
+def _spelling_variant(name, rng):
+    for suffix, variants in _SUFFIX_VARIANTS.items():
+        if name.endswith(suffix):
+            return name[: -len(suffix)] + variants[rng.integers(len(variants))]
+    return name.upper()
+
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def format_inr(value):
+    """'₹1,23,456.78' with Indian digit grouping."""
+    whole, frac = f"{abs(value):.2f}".split(".")
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        whole = ",".join(groups + [tail])
+    return f"{'-' if value < 0 else ''}₹{whole}.{frac}"
+
+
+def generate_raw(
+    n_rows,
+    seed=0,
+    n_customers=None,
+    n_managers=8,
+    formatted_rate=0.3,
+    blank_row_rate=0.005,
+    paid_rate=0.25,
+    missing_due_rate=0.01,
+    variant_rate=0.02,
+    today=None,
+):
+    """Return an AR frame of ``n_rows`` invoices shaped like ``pd.read_excel`` output.
+
+    Everything is driven by ``seed``, so the same arguments always give the same frame
+    (including which header spelling each column gets).
+    """
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(today if today is not None else "2025-11-08")
+    n_customers = n_customers or int(np.clip(n_rows // 200, 50, 20_000))
+    n_managers = min(n_managers, len(_MANAGERS))
+
+    customers = np.array(_customer_names(n_customers, rng), dtype=object)
+    cust_idx = rng.choice(n_customers, size=n_rows, p=_zipf_weights(n_customers, 1.1))
+    # each customer belongs to one manager; managers' books are skewed too
+    cust_manager = rng.choice(n_managers, size=n_customers, p=_zipf_weights(n_managers, 0.8))
+    names = customers[cust_idx]
+    variant_rows = np.flatnonzero(rng.random(n_rows) < variant_rate)
+    names[variant_rows] = [_spelling_variant(n, rng) for n in names[variant_rows]]
+
+    invoice_date = today - pd.to_timedelta(rng.integers(0, 365, n_rows), unit="D")
+    due_date = invoice_date + pd.to_timedelta(rng.choice([15, 30, 45, 60, 90], n_rows), unit="D")
+    due_date = due_date.where(rng.random(n_rows) >= missing_due_rate)
+
+    invoice_amt = np.round(rng.lognormal(11.5, 1.2, n_rows), 2)
+    paid_frac = np.where(rng.random(n_rows) < paid_rate, 1.0, rng.random(n_rows) * rng.integers(0, 2, n_rows))
+    paid_amt = np.round(invoice_amt * paid_frac, 2)
+    due_amt = np.round(invoice_amt - paid_amt, 2)
+
+    frame = {
+        "Invoice No.": pd.Series(np.arange(1, n_rows + 1)).map("INV/{:08d}".format).to_numpy(dtype=object),
+        "Customer Name": names,
+        "Account Manager": np.array(_MANAGERS, dtype=object)[cust_manager[cust_idx]],
+        "Invoice Date": invoice_date,
+        "Due Date": due_date,
+        "Invoice Amount": invoice_amt.astype(object),
+        "Paid Amount": paid_amt.astype(object),
+        "Due Amount": due_amt.astype(object),
+        "Payment Status": np.where(due_amt <= 0, "Paid", np.where(paid_amt > 0, "Partially Paid", "Unpaid")),
+    }
+    for col in ("Invoice Amount", "Paid Amount", "Due Amount"):
+        rows = np.flatnonzero(rng.random(n_rows) < formatted_rate)
+        values = frame[col]
+        half = len(rows) // 2
+        values[rows[:half]] = [format_inr(v) for v in values[rows[:half]]]
+        values[rows[half:]] = [f"{v:,.2f}" for v in values[rows[half:]]]
+
+    df = pd.DataFrame(frame)
+    blank = rng.random(n_rows) < blank_row_rate
+    df.loc[blank, :] = None
+
+    df.columns = [HEADER_VARIANTS[c][rng.integers(len(HEADER_VARIANTS[c]))] for c in df.columns]
+    return df
+
+
+def write_workbook(df, path, title_rows=0):
+    """Write ``df`` to an .xlsx file (openpyxl write-only), optionally below report title rows."""
+    from openpyxl import Workbook
+
+    if len(df) + title_rows + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df):,} rows do not fit in one Excel sheet ({EXCEL_MAX_ROWS:,} max)")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("AR Report")
+    for i in range(title_rows):
+        ws.append(["DEV IT SERV PVT LTD - Accounts Receivable Report" if i == 0 else None])
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if v is None or v is pd.NaT or (isinstance(v, float) and v != v) else v for v in row])
+    wb.save(path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic AR workbook.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--title-rows", type=int, default=0, help="report title rows above the header")
+    args = parser.parse_args(argv)
+    write_workbook(generate_raw(args.rows, seed=args.seed), args.path, title_rows=args.title_rows)
+    print(f"Wrote {args.rows:,} invoices to {args.path}")
+
+
+if __name__ == "__main__":
+    main()